@@ -5,7 +5,13 @@ from aiogram.dispatcher.filters import Filter
 from abc import ABC, abstractmethod
 
 from .text_processors import BaseProcessor, JSONProcessor
-from .filters import StartsWith, HasMenu, BuiltInFilters
+from .filters import MenuCallback, HasMenu, BuiltInFilters, FilterEngine, awaitable_filter
+from .callbacks import CallbackCodec
+from .keyboards import KeyboardCache
+from .languages import FallbackIndex
+from .deletion import DeletionQueue
+from .ratelimit import RateLimiter
+from .media import MediaCache
 from .storages import BaseStorage
 from . import handlers
 
@@ -21,7 +27,13 @@ class BaseNeko(ABC):
             entrypoint: str = 'start',
             menu_prefixes: Union[List[str]] = 'menu_',
             callback_parameters_delimiter: str = '#',
-            delete_messages: bool = True
+            delete_messages: bool = True,
+            keyboard_cache_size: int = 1024,
+            media_cache_size: int = 64 * 1024 * 1024,
+            reuse_media_file_ids: bool = True,
+            language_fallbacks: Optional[Dict[str, List[str]]] = None,
+            compact_callback_data: bool = False,
+            rate_limiter: Optional[RateLimiter] = None
     ):
         """
         Initialize a Neko.
@@ -35,6 +47,14 @@ class BaseNeko(ABC):
         :param menu_prefixes: Common prefixes for menus defined in translation files.
         :param callback_parameters_delimiter: A delimiter for callback data arguments.
         :param delete_messages: Whether to delete old messages in conversation automatically.
+        :param keyboard_cache_size: Max number of prebuilt static keyboards to keep, 0 disables the cache.
+        :param media_cache_size: Max number of bytes of local menu media to keep mapped, 0 disables the cache.
+        :param reuse_media_file_ids: Whether to send local menu media by Telegram file IDs once it was uploaded.
+        :param language_fallbacks: Languages to take untranslated menus from for each language in order of preference,
+        e.g. `{'uk': ['ru', 'en']}`, the default language is used after them.
+        :param compact_callback_data: Whether to encode menu callback data as short menu ids and packed arguments,
+        `name#argument` callback data is still accepted.
+        :param rate_limiter: A RateLimiter to pace outbound messages of the bot with.
         """
         self.bot: Bot
         self.dp: Dispatcher
@@ -47,6 +67,9 @@ class BaseNeko(ABC):
             self.dp = Dispatcher(bot=self.bot)
         else:
             raise ValueError('No Dispatcher, Bot or token provided during Neko initialization')
+        self.rate_limiter: Optional[RateLimiter] = rate_limiter
+        if rate_limiter is not None:
+            rate_limiter.install(self.bot)
 
         self.storage: BaseStorage = storage
 
@@ -60,11 +83,15 @@ class BaseNeko(ABC):
         self.menu_prefixes: List[str] = menu_prefixes
         self.filters: Dict[str, callable] = dict()
         self.callback_parameters_delimiter: str = callback_parameters_delimiter
+        self.callback_codec: Optional[CallbackCodec] = CallbackCodec(
+            self.text_processor, prefixes=self._callback_prefixes, delimiter=callback_parameters_delimiter
+        ) if compact_callback_data else None
         self.register_handlers()
 
         builtin_filters = BuiltInFilters()
         for f in builtin_filters.to_list:
-            self.filters[f] = getattr(builtin_filters, f'is_{f}')
+            self.filters[f] = awaitable_filter(getattr(builtin_filters, f'is_{f}'))
+        self.filter_engine: FilterEngine = FilterEngine(self.filters)
 
         self.functions: Dict[str, Callable[
             [Any, Union[types.Message, types.CallbackQuery, types.InlineQuery], BaseNeko], Awaitable[Any]
@@ -74,6 +101,11 @@ class BaseNeko(ABC):
         self.next_menu_handlers: Dict[str, Callable[[Any], Awaitable[str]]] = dict()
         self._markup_overriders: Dict[str, Dict[str, Callable[[Any], Awaitable[List[List[Dict[str, str]]]]]]] = dict()
         self.delete_messages: bool = delete_messages
+        self.deletion_queue: DeletionQueue = DeletionQueue()
+        self.keyboard_cache: KeyboardCache = KeyboardCache(max_size=keyboard_cache_size)
+        self.media_cache: MediaCache = MediaCache(max_bytes=media_cache_size)
+        self.reuse_media_file_ids: bool = reuse_media_file_ids
+        self.language_fallbacks: FallbackIndex = FallbackIndex(self.text_processor, chains=language_fallbacks)
 
         print(r'''
    _  __    __        _____             
@@ -82,6 +114,10 @@ class BaseNeko(ABC):
 /_/|_/\__/_/\_\\___/\___/_/  \_,_/_/_/_/
 ''')
 
+    @property
+    def _callback_prefixes(self) -> List[str]:
+        return self.menu_prefixes if 'widget_' in self.menu_prefixes else [*self.menu_prefixes, 'widget_']
+
     def register_handlers(self):
         """
         Registers default handlers.
@@ -89,10 +125,13 @@ class BaseNeko(ABC):
         self.dp.register_message_handler(
             handlers._start_handler, ChatTypeFilter(types.ChatType.PRIVATE), commands=['start']  # noqa
         )
-        for menu_prefix in self.menu_prefixes:
-            self.dp.register_callback_query_handler(handlers.menu_callback_query_handler, StartsWith(menu_prefix))
-        if 'widget_' not in self.menu_prefixes:
-            self.dp.register_callback_query_handler(handlers.menu_callback_query_handler, StartsWith('widget_'))
+        self.dp.register_callback_query_handler(
+            handlers.menu_callback_query_handler,
+            MenuCallback(
+                self._callback_prefixes, text_processor=self.text_processor,
+                delimiter=self.callback_parameters_delimiter, codec=self.callback_codec
+            )
+        )
         self.dp.register_message_handler(
             handlers.menu_message_handler,
             ChatTypeFilter(types.ChatType.PRIVATE),
@@ -132,10 +171,12 @@ class BaseNeko(ABC):
             fast: bool = True,
             allowed_updates: Optional[List[str]] = None
     ) -> None:
+        if self.callback_codec is not None:
+            self.callback_codec.validate()
         executor.start_polling(
             self.dp,
             on_startup=on_startup,
-            on_shutdown=on_shutdown,
+            on_shutdown=[on_shutdown, self.deletion_queue.close] if on_shutdown else self.deletion_queue.close,
             loop=loop,
             skip_updates=skip_updates,
             reset_webhook=reset_webhook,
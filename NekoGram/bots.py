@@ -0,0 +1,82 @@
+from typing import Optional, Dict, Any
+from collections import OrderedDict
+from aiogram import Bot, types
+from aiogram.bot import api
+import copy
+
+
+class BotPool:
+    """
+    Lightweight Bot objects of child bots for Kitty webhooks, the most recently used ones are kept.
+    Child bots share the session of the main bot and send requests through it (and a RateLimiter installed on it),
+    so they must not be closed.
+    """
+
+    def __init__(self, bot: Bot, max_size: int = 1024):
+        """
+        Initialize BotPool.
+        :param bot: The main Aiogram Bot object.
+        :param max_size: Max number of child bots to keep.
+        """
+        self.bot: Bot = bot
+        self.max_size: int = max_size
+        self._bots: Dict[str, Bot] = OrderedDict()
+        self._me: Dict[str, types.User] = dict()
+
+    def _child(self, token: str) -> Bot:
+        child: Bot = copy.copy(self.bot)  # Skips setting up a session and an SSL context
+        child._token = token  # noqa
+        child.id = int(token.split(':')[0])
+        child.__dict__.pop('_me', None)  # Cached by `Bot.me`
+
+        async def request(method: str, data: Optional[Dict[str, Any]] = None, files: Optional[Dict[str, Any]] = None,
+                          **kwargs) -> Any:
+            with self.bot.with_token(token, validate_token=False):
+                return await self.bot.request(method, data, files, **kwargs)
+        child.request = request
+        return child
+
+    def get(self, token: str, validate_token: bool = True) -> Bot:
+        """
+        Get a Bot object of a child bot.
+        :param token: Child bot token.
+        :param validate_token: Whether to validate the token if the bot is not in the pool.
+        :return: Aiogram Bot object.
+        """
+        child = self._bots.get(token)
+        if child is not None:
+            self._bots.move_to_end(token)
+            return child
+        if validate_token:
+            api.check_token(token)
+
+        child = self._bots[token] = self._child(token)
+        if len(self._bots) > self.max_size:
+            evicted, _ = self._bots.popitem(last=False)
+            self._me.pop(evicted, None)
+        return child
+
+    async def get_me(self, token: str, validate_token: bool = True) -> types.User:
+        """
+        Get a child bot, the result is cached while the bot is in the pool.
+        :param token: Child bot token.
+        :param validate_token: Whether to validate the token if the bot is not in the pool.
+        :return: Aiogram User object.
+        """
+        me = self._me.get(token)
+        if me is None:
+            me = await self.get(token, validate_token=validate_token).get_me()
+            if token in self._bots:
+                self._me[token] = me
+        return me
+
+    def forget(self, token: str) -> None:
+        """
+        Remove a child bot from the pool, e.g. after its token was revoked.
+        :param token: Child bot token.
+        """
+        self._bots.pop(token, None)
+        self._me.pop(token, None)
+
+    def __len__(self) -> int:
+        return len(self._bots)
@@ -0,0 +1,390 @@
+from typing import (Optional, Dict, List, Union, Any, Iterable, AsyncIterable, AsyncGenerator, Callable, Awaitable,
+                    Tuple)
+from aiogram.utils import exceptions as aiogram_exc
+from uuid import uuid4
+import asyncio
+import socket
+import time
+import os
+
+from .ratelimit import RateLimiter, TokenBucket, TRANSIENT_ERRORS, use_lane
+from .storages import BaseStorage
+from .base_neko import BaseNeko
+from .logger import LOGGER
+
+BLOCKED_ERRORS: Tuple[type, ...] = (
+    aiogram_exc.BotBlocked,
+    aiogram_exc.UserDeactivated
+)  # Recipient will not receive messages until they start the bot again
+
+
+class BroadcastStats:
+    __slots__ = ('total', 'attempts', 'successful', 'failed', 'blocked', 'started')
+
+    def __init__(self, total: Optional[int] = None):
+        self.total: Optional[int] = total
+        self.attempts: int = 0
+        self.successful: int = 0
+        self.failed: int = 0  # Including blocked
+        self.blocked: int = 0
+        self.started: float = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        """
+        Messages per second since the broadcast started.
+        """
+        elapsed = time.monotonic() - self.started
+        return self.attempts / elapsed if elapsed else 0
+
+    def to_dict(self) -> Dict[str, Union[int, float, None]]:
+        return {
+            'total': self.total,
+            'attempts': self.attempts,
+            'successful': self.successful,
+            'failed': self.failed,
+            'blocked': self.blocked,
+            'rate': round(self.rate, 2)
+        }
+
+
+class Broadcast:
+    """
+    Sends a message to many users concurrently at the max allowed rate in the bulk lane.
+    Users who blocked the bot are marked in storage and skipped by further broadcasts.
+    """
+
+    def __init__(
+            self,
+            neko: BaseNeko,
+            send: Callable[[int], Awaitable[Any]],
+            workers: int = 16,
+            rate: float = 25,
+            max_retries: int = 3,
+            progress: Optional[Callable[[BroadcastStats], Awaitable[Any]]] = None,
+            progress_interval: float = 5
+    ):
+        """
+        Initialize Broadcast.
+        :param neko: Neko to broadcast with.
+        :param send: A coroutine function that sends the message to a chat ID.
+        :param workers: Number of messages to send concurrently.
+        :param rate: Max messages per second, only applies if the bot has no RateLimiter installed.
+        :param max_retries: Max number of times a message is retried after a network error.
+        :param progress: A coroutine function called with stats every progress_interval seconds.
+        :param progress_interval: Seconds between progress calls.
+        """
+        self.neko: BaseNeko = neko
+        self.send: Callable[[int], Awaitable[Any]] = send
+        self.workers: int = workers
+        self.max_retries: int = max_retries
+        self.progress: Optional[Callable[[BroadcastStats], Awaitable[Any]]] = progress
+        self.progress_interval: float = progress_interval
+        self.stats: BroadcastStats = BroadcastStats()
+        # A RateLimiter installed on the bot paces requests already
+        self._bucket: Optional[TokenBucket] = TokenBucket(rate=rate, capacity=1) \
+            if RateLimiter.installed(neko.bot) is None else None
+        self._resume_at: float = 0  # Monotonic time to continue at after a flood limit
+
+    @staticmethod
+    async def recipients(storage: BaseStorage, exclude: Iterable[int] = ()) -> AsyncGenerator[int, None]:
+        """
+        Iterate over IDs of users who did not block the bot.
+        :param storage: Storage to read users from.
+        :param exclude: IDs of users to skip.
+        """
+        exclude = set(exclude)
+        async for user in storage.select(
+                'SELECT id FROM nekogram_users WHERE id NOT IN (SELECT id FROM nekogram_blocked_users);'
+        ):
+            if user['id'] not in exclude:
+                yield user['id']
+
+    @staticmethod
+    async def count_recipients(storage: BaseStorage) -> int:
+        """
+        Count users who did not block the bot.
+        :param storage: Storage to read users from.
+        """
+        row = await storage.get(
+            'SELECT COUNT(*) AS users FROM nekogram_users WHERE id NOT IN (SELECT id FROM nekogram_blocked_users);'
+        )
+        return int((row or dict()).get('users') or 0)
+
+    async def _wait(self) -> None:
+        while True:
+            delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        if self._bucket is not None:
+            delay = self._bucket.reserve(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def _deliver(self, user_id: int) -> None:
+        """
+        Send the message to a user, retrying network errors and waiting out flood limits.
+        :param user_id: Telegram user ID.
+        """
+        retries = 0
+        while True:
+            await self._wait()
+            try:
+                await self.send(user_id)
+                self.stats.successful += 1
+                return
+            except aiogram_exc.RetryAfter as e:  # Every worker waits, the limit applies to the whole bot
+                self._resume_at = max(self._resume_at, time.monotonic() + e.timeout)
+            except BLOCKED_ERRORS:
+                self.stats.failed += 1
+                self.stats.blocked += 1
+                await self.neko.storage.set_user_blocked(user_id=user_id)
+                return
+            except TRANSIENT_ERRORS:
+                if retries == self.max_retries:
+                    self.stats.failed += 1
+                    return
+                retries += 1
+                await asyncio.sleep(2 ** retries)
+            except Exception as e:  # noqa
+                LOGGER.warning(f'Broadcast to {user_id} failed: {e}')
+                self.stats.failed += 1
+                return
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            user_id = await queue.get()
+            try:
+                if user_id is None:
+                    return
+                self.stats.attempts += 1
+                await self._deliver(user_id)
+            except Exception as e:  # noqa
+                LOGGER.exception(f'Broadcast worker failed on {user_id}: {e} *hisses*')
+            finally:
+                queue.task_done()
+
+    async def _notify(self) -> None:
+        try:
+            await self.progress(self.stats)
+        except Exception as e:  # noqa
+            LOGGER.warning(f'Broadcast progress callback failed: {e} *confused meow*')
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            await self._notify()
+
+    async def run(self, user_ids: Union[Iterable[int], AsyncIterable[int]], total: Optional[int] = None) -> BroadcastStats:
+        """
+        Send the message to users.
+        :param user_ids: User IDs, e.g. `Broadcast.recipients(neko.storage)`.
+        :param total: Number of users, used for progress reporting.
+        :return: Final stats.
+        """
+        self.stats = BroadcastStats(total=total)
+        reporter = asyncio.get_running_loop().create_task(self._report()) if self.progress else None
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        with use_lane('bulk'):  # Workers inherit the lane
+            workers = [asyncio.get_running_loop().create_task(self._worker(queue)) for _ in range(self.workers)]
+        try:
+            if isinstance(user_ids, AsyncIterable):
+                async for user_id in user_ids:
+                    await queue.put(user_id)
+            else:
+                for user_id in user_ids:
+                    await queue.put(user_id)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in (*workers, reporter):
+                if task is not None:
+                    task.cancel()
+        if self.progress:  # Progress always ends with the final stats
+            await self._notify()
+        return self.stats
+
+
+class BroadcastJob:
+    """
+    A broadcast persisted in storage. Users are split into ranges of IDs, workers claim ranges and checkpoint
+    the last processed user with counters after every batch, so a job resumes where it stopped after a restart
+    and any number of processes can run it at once. Delivery is at-least-once: a batch interrupted before its
+    checkpoint is sent again.
+    """
+
+    def __init__(self, neko: BaseNeko, job_id: str, data: Dict[str, Any]):
+        """
+        Initialize BroadcastJob, use `create` or `load` instead.
+        :param neko: Neko to broadcast with.
+        :param job_id: Job ID.
+        :param data: Job data with payload, exclude and total.
+        """
+        self.neko: BaseNeko = neko
+        self.id: str = job_id
+        self.data: Dict[str, Any] = data
+
+    @property
+    def payload(self) -> Dict[str, Any]:
+        return self.data['payload']
+
+    @classmethod
+    async def create(
+            cls,
+            neko: BaseNeko,
+            payload: Dict[str, Any],
+            job_id: Optional[str] = None,
+            ranges: int = 16,
+            exclude: Iterable[int] = ()
+    ) -> 'BroadcastJob':
+        """
+        Save a new broadcast job.
+        :param neko: Neko to broadcast with.
+        :param payload: JSON serializable data required to send the message.
+        :param job_id: Unique job ID, generated if not passed.
+        :param ranges: Number of user ID ranges to split the job into, max number of processes the job can run in.
+        :param exclude: IDs of users to skip.
+        :return: BroadcastJob object.
+        """
+        exclude = sorted(set(exclude))
+        # Ranges hold equal numbers of users, Telegram IDs are distributed too unevenly for equal widths
+        id_ranges: List[Tuple[int, int]] = await neko.storage.get_user_id_ranges(ranges=ranges)
+        total: int = max(await Broadcast.count_recipients(neko.storage) - len(exclude), 0)
+
+        job = cls(neko=neko, job_id=job_id or uuid4().hex, data={'payload': payload, 'exclude': exclude, 'total': total})
+        await neko.storage.create_broadcast(job_id=job.id, data=job.data, ranges=id_ranges)
+        return job
+
+    @classmethod
+    async def load(cls, neko: BaseNeko, job_id: str) -> Optional['BroadcastJob']:
+        """
+        Load a saved broadcast job.
+        :param neko: Neko to broadcast with.
+        :param job_id: Job ID.
+        :return: BroadcastJob object or None if the job does not exist.
+        """
+        job = await neko.storage.get_broadcast(job_id=job_id)
+        return cls(neko=neko, job_id=job['id'], data=job['data']) if job else None
+
+    @classmethod
+    async def running(cls, neko: BaseNeko) -> List['BroadcastJob']:
+        """
+        Get unfinished broadcast jobs, e.g. to resume them on startup.
+        :param neko: Neko to broadcast with.
+        """
+        return [cls(neko=neko, job_id=job['id'], data=job['data']) for job in await neko.storage.get_broadcasts()]
+
+    async def cancel(self) -> None:
+        """
+        Stop the job in every process after their current batches.
+        """
+        await self.neko.storage.set_broadcast_status(job_id=self.id, status='cancelled')
+
+    async def stats(self) -> Dict[str, int]:
+        """
+        Get stats of the job summed up over all processes.
+        :return: A dict of total, attempts, successful, failed and blocked.
+        """
+        stats = await self.neko.storage.get_broadcast_stats(job_id=self.id)
+        return {
+            'total': self.data['total'],
+            'attempts': stats['successful'] + stats['failed'],
+            'successful': stats['successful'],
+            'failed': stats['failed'],
+            'blocked': stats['blocked']
+        }
+
+    async def _notify(self, progress: Callable[[Dict[str, int]], Awaitable[Any]]) -> None:
+        try:
+            await progress(await self.stats())
+        except Exception as e:  # noqa
+            LOGGER.warning(f'Broadcast progress callback failed: {e} *confused meow*')
+
+    async def _report(self, progress: Callable[[Dict[str, int]], Awaitable[Any]], interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self._notify(progress)
+
+    async def _run_range(self, claimed: Dict[str, Any], worker_id: str, batch_size: int, **kwargs) -> bool:
+        """
+        Send the message to users of a claimed range in batches, checkpointing after each one.
+        :return: False if the job should stop.
+        """
+        exclude = set(self.data['exclude'])
+        range_start: int = claimed['range_start']
+        last_user_id: int = claimed['last_user_id'] if claimed['last_user_id'] is not None else range_start - 1
+        while True:
+            job = await self.neko.storage.get_broadcast(job_id=self.id)
+            if not job or job['status'] != 'running':
+                return False
+            user_ids = await self.neko.storage.get_broadcast_recipients(
+                after=last_user_id, until=claimed['range_end'], limit=batch_size
+            )
+            stats = await Broadcast(neko=self.neko, **kwargs).run([i for i in user_ids if i not in exclude])
+            if user_ids:
+                last_user_id = user_ids[-1]
+            done = len(user_ids) < batch_size
+            if not await self.neko.storage.checkpoint_broadcast_range(
+                    job_id=self.id,
+                    range_start=range_start,
+                    worker_id=worker_id,
+                    last_user_id=last_user_id,
+                    successful=stats.successful,
+                    failed=stats.failed,
+                    blocked=stats.blocked,
+                    done=done
+            ):
+                LOGGER.warning(f'Broadcast {self.id} range {range_start} was reclaimed by another worker. *hisses*')
+                return True
+            if done:
+                return True
+
+    async def run(
+            self,
+            send: Callable[[int], Awaitable[Any]],
+            workers: int = 16,
+            rate: float = 25,
+            max_retries: int = 3,
+            batch_size: int = 500,
+            lease: int = 300,
+            progress: Optional[Callable[[Dict[str, int]], Awaitable[Any]]] = None,
+            progress_interval: float = 5
+    ) -> Dict[str, int]:
+        """
+        Claim and process ranges of the job until none is left.
+        :param send: A coroutine function that sends the message to a chat ID.
+        :param workers: Number of messages to send concurrently.
+        :param rate: Max messages per second, only applies if the bot has no RateLimiter installed.
+        :param max_retries: Max number of times a message is retried after a network error.
+        :param batch_size: Number of users between checkpoints.
+        :param lease: Seconds after which a range of a worker that stopped checkpointing is reclaimed,
+        has to exceed the time a batch takes.
+        :param progress: A coroutine function called with job stats every progress_interval seconds.
+        :param progress_interval: Seconds between progress calls.
+        :return: Job stats.
+        """
+        worker_id = f'{socket.gethostname()[:32]}:{os.getpid()}:{uuid4().hex[:8]}'
+        reporter = asyncio.get_running_loop().create_task(self._report(progress, progress_interval)) \
+            if progress else None
+        try:
+            while True:
+                claimed = await self.neko.storage.claim_broadcast_range(
+                    job_id=self.id, worker_id=worker_id, lease=lease
+                )
+                if claimed is None or not await self._run_range(
+                        claimed, worker_id=worker_id, batch_size=batch_size, send=send, workers=workers, rate=rate,
+                        max_retries=max_retries
+                ):
+                    break
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+
+        progress_data = await self.neko.storage.get_broadcast_stats(job_id=self.id)
+        if progress_data['done'] == progress_data['ranges']:
+            await self.neko.storage.set_broadcast_status(job_id=self.id, status='done')
+        if progress:  # Progress always ends with the final stats
+            await self._notify(progress)
+        return await self.stats()
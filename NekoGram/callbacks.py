@@ -0,0 +1,163 @@
+from typing import Optional, Union, Dict, List, Tuple
+from base64 import urlsafe_b64encode
+import hashlib
+import string
+
+from .text_processors import BaseProcessor
+from .logger import LOGGER
+
+_BASE36: str = string.digits + string.ascii_lowercase
+
+
+def _convert_call_data(call_data: List[str]) -> Optional[Union[str, int]]:
+    if len(call_data) == 1:
+        return None
+
+    call_data = call_data[1]
+    return int(call_data) if call_data.isdecimal() else call_data
+
+
+def decode_legacy(data: str, delimiter: str = '#') -> Tuple[str, Optional[Union[str, int]]]:
+    """
+    Decode callback data of `name#argument` format.
+    :param data: Callback data.
+    :param delimiter: Callback parameters delimiter.
+    :return: Menu name and its argument.
+    """
+    call_data = data.split(delimiter)
+    return call_data[0], _convert_call_data(call_data)
+
+
+def _to_base36(value: int) -> str:
+    digits: List[str] = list()
+    while True:
+        value, remainder = divmod(value, 36)
+        digits.append(_BASE36[remainder])
+        if not value:
+            return ''.join(reversed(digits))
+
+
+class CallbackCodec:
+    """
+    Compact callback data: `~` marker, a fixed-width id derived from the menu name and a typed argument,
+    `.` followed by a base36 integer or `,` followed by a string.
+    For example `menu_configure_preferences#15` becomes `~0ui625.f`.
+    """
+    marker: str = '~'
+    _int_tag: str = '.'
+    _str_tag: str = ','
+
+    def __init__(self, text_processor: BaseProcessor, prefixes: List[str], delimiter: str = '#', id_length: int = 6):
+        """
+        Initialize CallbackCodec.
+        :param text_processor: Text processor menus are defined in.
+        :param prefixes: Prefixes of menu callbacks, other callback data is left as is.
+        :param delimiter: Callback parameters delimiter of the legacy format.
+        :param id_length: Length of menu ids.
+        """
+        self.text_processor: BaseProcessor = text_processor
+        self.prefixes: Tuple[str, ...] = tuple(prefixes)
+        self.delimiter: str = delimiter
+        self.id_length: int = id_length
+        self._ids: Dict[str, str] = dict()  # Menu names and their ids
+        self._names: Dict[str, Optional[str]] = dict()  # Menu ids and their names, None for colliding ids
+        self._scanned: Optional[Tuple[int, int]] = None  # Processor version and number of scanned languages
+
+    def menu_id(self, name: str) -> str:
+        """
+        Get an id of a menu, ids only depend on menu names so they are the same between restarts and workers.
+        :param name: Menu name.
+        :return: Menu id.
+        :raises ValueError: If the id collides with an id of another menu.
+        """
+        menu_id = self._ids.get(name)
+        if menu_id is not None:
+            return menu_id
+        menu_id = urlsafe_b64encode(
+            hashlib.blake2b(name.encode('utf-8'), digest_size=self.id_length).digest()
+        ).decode()[:self.id_length]
+        other = self._names.setdefault(menu_id, name)
+        if other != name:  # Neither menu gets the id, whichever was seen first, so it never resolves to a wrong one
+            self._ids.pop(other, None)
+            self._names[menu_id] = None
+            names = ' and '.join(sorted((name, other))) if other is not None else name
+            raise ValueError(f'Callback id {menu_id} of {names} collides, rename the menu or increase id_length.')
+        self._ids[name] = menu_id
+        return menu_id
+
+    def validate(self) -> None:
+        """
+        Assign ids to menus of loaded languages, meant to be called on startup so colliding ids are found early.
+        :raises ValueError: If ids of menus collide, after all other menus get their ids.
+        """
+        errors: List[str] = list()
+        for texts in list(self.text_processor.loaded_languages.values()):
+            for name in texts:
+                if name.startswith(self.prefixes):
+                    try:
+                        self.menu_id(name)
+                    except ValueError as e:
+                        errors.append(str(e))
+        if errors:
+            raise ValueError(' '.join(sorted(set(errors))))
+
+    def encode(self, data: str) -> str:
+        """
+        Compact callback data of `name#argument` format, data of unknown format is returned as is.
+        :param data: Callback data.
+        :return: Encoded callback data.
+        """
+        if not isinstance(data, str) or not data.startswith(self.prefixes):
+            return data
+        name, argument = decode_legacy(data, self.delimiter)
+        try:
+            menu_id = self.menu_id(name)
+        except ValueError as e:
+            LOGGER.warning(f'{e} Callback data of {name} is not compacted. *confused meow*')
+            return data
+        if argument is None:
+            return f'{self.marker}{menu_id}'
+        elif isinstance(argument, int):
+            return f'{self.marker}{menu_id}{self._int_tag}{_to_base36(argument)}'
+        return f'{self.marker}{menu_id}{self._str_tag}{argument}'
+
+    def _scan(self) -> None:
+        """
+        Register menu names of loaded languages, so ids issued before a restart can be resolved.
+        Languages are not parsed for this in lazy mode, except for one if none are loaded yet.
+        """
+        loaded = self.text_processor.loaded_languages
+        if not loaded and self.text_processor.index:
+            self.text_processor.get_language(next(iter(self.text_processor.index)))
+        key = (self.text_processor.version, len(loaded))
+        if self._scanned == key:
+            return
+        self._scanned = key
+        try:
+            self.validate()
+        except ValueError as e:
+            LOGGER.warning(f'{e} *confused meow*')
+
+    def decode(self, data: str) -> Tuple[Optional[str], Optional[Union[str, int]]]:
+        """
+        Decode compact or legacy callback data in a single pass.
+        :param data: Callback data.
+        :return: Menu name (None if the menu id is unknown) and its argument.
+        """
+        if not data.startswith(self.marker):
+            return decode_legacy(data, self.delimiter)
+        end = len(self.marker) + self.id_length
+        menu_id = data[len(self.marker):end]
+        name = self._names.get(menu_id)
+        if name is None:
+            self._scan()
+            name = self._names.get(menu_id)
+        tag, value = data[end:end + 1], data[end + 1:]
+        if tag == self._int_tag:
+            try:
+                return name, int(value, 36)
+            except ValueError:  # Malformed data
+                return None, None
+        elif tag == self._str_tag:
+            return name, value
+        return name, None
@@ -0,0 +1,187 @@
+from aiogram.utils import exceptions as aiogram_exc
+from typing import Optional, Dict, List, Set, Tuple
+from contextlib import suppress
+from aiogram import Bot
+import asyncio
+import time
+
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+from .ratelimit import TRANSIENT_ERRORS
+from .logger import LOGGER
+
+
+class DeletionQueue:
+    """
+    Deletes messages in the background, so handlers do not wait for deletions.
+    Messages are deleted in batches per chat with `deleteMessages`. A chat hitting a flood limit or a transient error
+    is retried later, other chats are not held up meanwhile.
+    """
+    batch_size: int = 100  # deleteMessages limit
+
+    def __init__(self, max_age: float = 3600, max_attempts: int = 5):
+        """
+        Initialize DeletionQueue.
+        :param max_age: Seconds after which a message is not deleted anymore if the queue is behind.
+        :param max_attempts: Max number of attempts to delete messages of a chat.
+        """
+        self.max_age: float = max_age
+        self.max_attempts: int = max_attempts
+        self._pending: Dict[Tuple[str, int], Dict[int, float]] = dict()  # Bot token and chat ID: message IDs and times
+        self._strip: Dict[Tuple[str, int], Set[int]] = dict()  # Messages to remove keyboards of if not deleted
+        self._not_before: Dict[Tuple[str, int], float] = dict()  # Chats to retry later and when
+        self._attempts: Dict[Tuple[str, int], int] = dict()  # Failed attempts of chats
+        self._bots: Dict[str, Bot] = dict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closing: bool = False
+        self._bulk_supported: bool = True
+
+    def schedule(self, bot: Bot, chat_id: int, message_id: Optional[int], strip_markup: bool = False) -> None:
+        """
+        Queue a message for deletion.
+        :param bot: Aiogram Bot object, the token currently in use is used for deletion.
+        :param chat_id: Telegram chat ID.
+        :param message_id: Telegram message ID, None is ignored.
+        :param strip_markup: Whether to remove the keyboard of the message if it can not be deleted.
+        """
+        if message_id is None:
+            return
+        token: str = bot._ctx_token.get(bot._token)  # noqa
+        self._bots[token] = bot
+        self._pending.setdefault((token, chat_id), dict())[message_id] = time.monotonic()
+        if strip_markup:
+            self._strip.setdefault((token, chat_id), set()).add(message_id)
+
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    def __len__(self) -> int:
+        return sum(len(messages) for messages in self._pending.values())
+
+    def _next_delay(self) -> Optional[float]:
+        """
+        Get the number of seconds until a chat can be processed.
+        :return: Seconds or None if nothing is queued.
+        """
+        if not self._pending:
+            return None
+        return max(0.0, min(self._not_before.get(key, 0) for key in self._pending) - time.monotonic())
+
+    async def _run(self) -> None:
+        while not self._closing:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_delay())
+            self._wakeup.clear()
+            await self._drain()
+
+    async def _drain(self, wait: bool = False) -> None:
+        """
+        Delete queued messages of chats that are not waiting for a retry.
+        :param wait: Whether to wait for chats to be retried until the queue is empty.
+        """
+        while self._pending:
+            now = time.monotonic()
+            key = next((key for key in self._pending if self._not_before.get(key, 0) <= now), None)
+            if key is None:
+                if not wait:
+                    return
+                await asyncio.sleep(self._next_delay())
+                continue
+            self._not_before.pop(key, None)
+            messages = self._pending.pop(key)  # Messages queued meanwhile form the next batch
+            await self._delete(*key, messages=messages, strip=self._strip.pop(key, set()))
+
+    async def _delete(self, token: str, chat_id: int, messages: Dict[int, float], strip: Set[int]) -> None:
+        """
+        Delete messages of a chat, the chat is queued again on flood limits and transient errors.
+        :param token: Bot token.
+        :param chat_id: Telegram chat ID.
+        :param messages: Message IDs and times they were queued at.
+        :param strip: IDs of messages to remove keyboards of if they can not be deleted.
+        """
+        now = time.monotonic()
+        message_ids: List[int] = [m for m, queued in messages.items() if now - queued < self.max_age]
+        if not message_ids:
+            self._attempts.pop((token, chat_id), None)
+            return
+
+        bot = self._bots[token]
+        try:
+            with bot.with_token(token, validate_token=False):
+                await self._request(bot, chat_id=chat_id, message_ids=message_ids, strip=strip)
+        except aiogram_exc.RetryAfter as e:
+            self._retry(token, chat_id, messages=messages, strip=strip, delay=e.timeout)
+        except Exception as e:  # noqa
+            if isinstance(e, TRANSIENT_ERRORS) or type(e) is aiogram_exc.TelegramAPIError:  # Server errors included
+                self._retry(token, chat_id, messages=messages, strip=strip,
+                            delay=2 ** self._attempts.get((token, chat_id), 0))
+            else:  # Messages that can not be deleted are skipped, same as the deletion would fail inline
+                self._attempts.pop((token, chat_id), None)
+        else:
+            self._attempts.pop((token, chat_id), None)
+
+    def _retry(self, token: str, chat_id: int, messages: Dict[int, float], strip: Set[int], delay: float) -> None:
+        """
+        Queue messages of a chat again to be deleted after a delay.
+        :param token: Bot token.
+        :param chat_id: Telegram chat ID.
+        :param messages: Message IDs and times they were queued at.
+        :param strip: IDs of messages to remove keyboards of if they can not be deleted.
+        :param delay: Seconds to wait for.
+        """
+        key = (token, chat_id)
+        attempts = self._attempts[key] = self._attempts.get(key, 0) + 1
+        if attempts >= self.max_attempts:
+            self._attempts.pop(key)
+            LOGGER.warning(f'Gave up deleting {len(messages)} messages in {chat_id} chat. *tired meow*')
+            return
+        self._pending[key] = {**messages, **self._pending.get(key, dict())}
+        if strip:
+            self._strip.setdefault(key, set()).update(strip)
+        self._not_before[key] = time.monotonic() + delay
+
+    async def _request(self, bot: Bot, chat_id: int, message_ids: List[int], strip: Set[int]) -> None:
+        for message_id in message_ids:
+            if message_id not in strip:
+                continue
+            try:  # One by one, the keyboard is removed if a message can not be deleted
+                await bot.delete_message(chat_id=chat_id, message_id=message_id)
+            except (aiogram_exc.MessageCantBeDeleted, aiogram_exc.MessageToDeleteNotFound):
+                with suppress(aiogram_exc.BadRequest):
+                    await bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id)
+        message_ids = [message_id for message_id in message_ids if message_id not in strip]
+
+        if self._bulk_supported:
+            try:
+                for i in range(0, len(message_ids), self.batch_size):
+                    await bot.request('deleteMessages', {
+                        'chat_id': chat_id, 'message_ids': json.dumps(message_ids[i:i + self.batch_size])
+                    })
+                return
+            except aiogram_exc.MethodNotKnown:
+                self._bulk_supported = False
+                LOGGER.warning('Bot API server does not support deleteMessages, deleting messages one by one.')
+
+        for message_id in message_ids:
+            with suppress(aiogram_exc.BadRequest):
+                await bot.delete_message(chat_id=chat_id, message_id=message_id)
+
+    async def close(self, *_) -> None:
+        """
+        Stop the background worker once it deletes messages left in the queue.
+        """
+        self._closing = True
+        try:
+            if self._worker is not None and not self._worker.done():
+                self._wakeup.set()
+                await self._worker  # The batch in flight is finished, not lost
+            self._worker = None
+            await self._drain(wait=True)
+        finally:
+            self._closing = False
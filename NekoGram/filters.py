@@ -1,9 +1,14 @@
 from aiogram.dispatcher.filters import Filter
 from aiogram.types import Message, CallbackQuery
-from typing import Dict, List, Any, Union, Optional
+from typing import Dict, List, Any, Union, Optional, Tuple, Callable, Awaitable
+from functools import wraps
+import inspect
 import re
 
 from .storages.base_storage import BaseStorage
+from .text_processors import BaseProcessor
+from .callbacks import CallbackCodec
+from .logger import LOGGER
 
 
 class HasMenu(Filter):
@@ -37,211 +42,277 @@ class StartsWith(Filter):
 
     async def check(self, obj: Union[Message, CallbackQuery]) -> bool:
         for text in self.starts_with:
-            if isinstance(obj, Message) and obj.text.startswith(text):
+            if isinstance(obj, Message) and obj.text and obj.text.startswith(text):
                 return True
-            elif isinstance(obj, CallbackQuery) and obj.data.startswith(text):
+            elif isinstance(obj, CallbackQuery) and obj.data and obj.data.startswith(text):
                 return True
-            return False
 
         return False
 
 
-class BuiltInFilters:
-    @staticmethod
-    async def _to_message(obj: Union[Message, CallbackQuery]) -> Message:
-        """
-        Convert CallbackQuery to Message if needed.
-        :param obj: A Message or CallbackQuery object.
-        :return: Message object.
-        """
-        if isinstance(obj, CallbackQuery):
-            obj = obj.message
-        return obj
+class MenuCallback(Filter):
+    """
+    Filter for callback queries of menus: data has to start with one of the prefixes and name a menu defined in texts.
+    Replaces a StartsWith filter per prefix, so a single handler serves all menu callbacks.
+    """
+
+    def __init__(self, prefixes: List[str], text_processor: BaseProcessor, delimiter: str = '#',
+                 codec: Optional[CallbackCodec] = None):
+        self.prefixes: Tuple[str, ...] = tuple(prefixes)
+        self.text_processor: BaseProcessor = text_processor
+        self.delimiter: str = delimiter
+        self.codec: Optional[CallbackCodec] = codec
+
+    @classmethod
+    def validate(cls, _: Dict[str, Any]):
+        return {}
+
+    async def check(self, obj: CallbackQuery) -> bool:
+        if not obj.data:
+            return False
+        if self.codec is not None and obj.data.startswith(self.codec.marker):
+            name = self.codec.decode(obj.data)[0]
+            if name is None:  # Unknown menu id
+                return False
+        elif obj.data.startswith(self.prefixes):
+            name = obj.data.split(self.delimiter, 1)[0]
+        else:
+            return False
+        names = self.text_processor.menu_names
+        if names is None:  # Not every language is loaded, menus will be resolved when built
+            return True
+        return name in names or name == 'menu_start'
+
+
+_HTTP_URL_PATTERN = re.compile(
+    r'http://[-a-zA-Z0-9@:%._+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_+.~#?&/=]*)$'
+)
+_HTTPS_URL_PATTERN = re.compile(
+    r'https://[-a-zA-Z0-9@:%._+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_+.~#?&/=]*)$'
+)
+_TG_URL_PATTERN = re.compile(r'tg://[-a-zA-Z0-9_?=]+')
+_MENTION_PATTERN = re.compile(r'@[a-zA-Z0-9_]+')
+_URL_PATTERN = re.compile(
+    r'(http|https|tg)://[-a-zA-Z0-9@:%._+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_+.~#?&/=]*)$'
+)
+_EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+_PHONE_NUMBER_PATTERN = re.compile(r'\+([0-9]+\s*)?([0-9]+)?[\s0-9\-]+[0-9]+')
+
+SyncCheck = Callable[[Union[Message, CallbackQuery]], bool]
+
+
+def _text(obj: Union[Message, CallbackQuery]) -> Optional[str]:
+    """
+    Get message text, for callback queries text of the message the keyboard is attached to.
+    """
+    if isinstance(obj, CallbackQuery):
+        obj = obj.message
+    return obj.text if obj else None
 
+
+def _to_int(obj: Union[Message, CallbackQuery]) -> Optional[int]:
+    try:
+        return int(_text(obj))
+    except (TypeError, ValueError):
+        return None
+
+
+def awaitable_filter(check: SyncCheck) -> Callable[[Union[Message, CallbackQuery]], Awaitable[bool]]:
+    """
+    Wrap a synchronous check into a coroutine function, FilterEngine calls the check directly.
+    :param check: Synchronous check.
+    :return: Coroutine function.
+    """
+    @wraps(check)
+    async def wrapper(obj: Union[Message, CallbackQuery]) -> bool:
+        return check(obj)
+    wrapper.sync_check = check
+    return wrapper
+
+
+class BuiltInFilters:
     @staticmethod
-    async def is_any(_: Union[Message, CallbackQuery]) -> bool:
+    def is_any(_: Union[Message, CallbackQuery]) -> bool:
         """
         Check if message is of any content types available.
         :return: Always True.
         """
         return True
 
-    async def is_int(self, obj: Union[Message, CallbackQuery]) -> bool:
+    @staticmethod
+    def is_int(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message text can be converted to an integer.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        obj = await self._to_message(obj)
-        return obj.text and obj.text.isdigit()
+        text = _text(obj)
+        return bool(text) and text.isdigit()
 
     @staticmethod
-    async def is_int_neg(obj: Union[Message, CallbackQuery]) -> bool:
+    def is_int_neg(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message text can be converted to a negative integer.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        try:
-            return int(obj.text) < 0
-        except ValueError:
-            return False
+        value = _to_int(obj)
+        return value is not None and value < 0
 
     @staticmethod
-    async def is_int_pos(obj: Union[Message, CallbackQuery]) -> bool:
+    def is_int_pos(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message text can be converted to a positive integer.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        try:
-            return int(obj.text) > 0
-        except ValueError:
-            return False
+        value = _to_int(obj)
+        return value is not None and value > 0
 
     @staticmethod
-    async def is_int_non_neg(obj: Union[Message, CallbackQuery]) -> bool:
+    def is_int_non_neg(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message text can be converted to a non-negative integer.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        try:
-            return int(obj.text) >= 0
-        except ValueError:
-            return False
+        value = _to_int(obj)
+        return value is not None and value >= 0
 
     @staticmethod
-    async def is_int_non_pos(obj: Union[Message, CallbackQuery]) -> bool:
+    def is_int_non_pos(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message text can be converted to a non-positive integer.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        try:
-            return int(obj.text) <= 0
-        except ValueError:
-            return False
+        value = _to_int(obj)
+        return value is not None and value <= 0
 
-    async def is_float(self, obj: Union[Message, CallbackQuery]) -> bool:
+    @staticmethod
+    def is_float(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message text can be converted to a float.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        obj = await self._to_message(obj)
-        return obj.text and obj.text.isnumeric()
+        text = _text(obj)
+        return bool(text) and text.isnumeric()
 
-    async def is_text(self, obj: Union[Message, CallbackQuery]) -> bool:
+    @staticmethod
+    def is_text(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message content is text.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        obj = await self._to_message(obj)
-        return bool(obj.text)
+        return bool(_text(obj))
 
-    async def is_photo(self, obj: Union[Message, CallbackQuery]) -> bool:
+    @staticmethod
+    def is_photo(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message content is a photo.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        obj = await self._to_message(obj)
+        if isinstance(obj, CallbackQuery):
+            obj = obj.message
         return obj.content_type == 'photo'
 
-    async def is_video(self, obj: Union[Message, CallbackQuery]) -> bool:
+    @staticmethod
+    def is_video(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message content is a video.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        obj = await self._to_message(obj)
+        if isinstance(obj, CallbackQuery):
+            obj = obj.message
         return obj.content_type == 'video'
 
-    async def is_animation(self, obj: Union[Message, CallbackQuery]) -> bool:
+    @staticmethod
+    def is_animation(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message content is a GIF.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        obj = await self._to_message(obj)
+        if isinstance(obj, CallbackQuery):
+            obj = obj.message
         return obj.content_type == 'animation'
 
-    async def is_http_url(self, obj: Union[Message, CallbackQuery]) -> bool:
+    @staticmethod
+    def is_http_url(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message text is an HTTP URL.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        obj = await self._to_message(obj)
-        return obj.text and re.fullmatch(
-            r'http://[-a-zA-Z0-9@:%._+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_+.~#?&/=]*)$',
-            obj.text
-        )
+        text = _text(obj)
+        return bool(text and _HTTP_URL_PATTERN.fullmatch(text))
 
-    async def is_https_url(self, obj: Union[Message, CallbackQuery]) -> bool:
+    @staticmethod
+    def is_https_url(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message text is an HTTPS URL.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        obj = await self._to_message(obj)
-        return obj.text and re.fullmatch(
-            r'https://[-a-zA-Z0-9@:%._+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_+.~#?&/=]*)$',
-            obj.text
-        )
+        text = _text(obj)
+        return bool(text and _HTTPS_URL_PATTERN.fullmatch(text))
 
-    async def is_tg_url(self, obj: Union[Message, CallbackQuery]) -> bool:
+    @staticmethod
+    def is_tg_url(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message text is a Telegram URL.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        obj = await self._to_message(obj)
-        return obj.text and re.fullmatch(r'tg://[-a-zA-Z0-9_?=]+', obj.text)
+        text = _text(obj)
+        return bool(text and _TG_URL_PATTERN.fullmatch(text))
 
-    async def is_mention(self, obj: Union[Message, CallbackQuery]) -> bool:
+    @staticmethod
+    def is_mention(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message text is a Telegram user mention.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        obj = await self._to_message(obj)
-        return obj.text and re.fullmatch(r'@[a-zA-Z0-9_]+', obj.text)
+        text = _text(obj)
+        return bool(text and _MENTION_PATTERN.fullmatch(text))
 
-    async def is_url(self, obj: Union[Message, CallbackQuery]) -> bool:
+    @staticmethod
+    def is_url(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message text is an HTTP/HTTPS/Telegram URL.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        obj = await self._to_message(obj)
-        return obj.text and re.fullmatch(
-            r'(http|https|tg)://[-a-zA-Z0-9@:%._+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_+.~#?&/=]*)$',
-            obj.text
-        )
+        text = _text(obj)
+        return bool(text and _URL_PATTERN.fullmatch(text))
 
-    async def is_email(self, obj: Union[Message, CallbackQuery]) -> bool:
+    @staticmethod
+    def is_email(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message text is an email.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        obj = await self._to_message(obj)
-        return obj.text and re.fullmatch(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', obj.text)
+        text = _text(obj)
+        return bool(text and _EMAIL_PATTERN.fullmatch(text))
 
-    async def is_phone_number(self, obj: Union[Message, CallbackQuery]) -> bool:
+    @staticmethod
+    def is_phone_number(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message text is an international phone number.
         :param obj: A Message or CallbackQuery object.
         :return: True if so.
         """
-        obj = await self._to_message(obj)
-        return obj.text and re.fullmatch(r'\+([0-9]+\s*)?([0-9]+)?[\s0-9\-]+[0-9]+', obj.text)
+        text = _text(obj)
+        return bool(text and _PHONE_NUMBER_PATTERN.fullmatch(text))
 
     @staticmethod
-    async def is_forwarded(obj: Union[Message, CallbackQuery]) -> bool:
+    def is_forwarded(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message is forwarded from any source.
         :param obj: A Message or CallbackQuery object.
@@ -253,7 +324,7 @@ class BuiltInFilters:
         return bool(obj.forward_from or obj.forward_from_chat)
 
     @staticmethod
-    async def is_forwarded_from_group(obj: Union[Message, CallbackQuery]) -> bool:
+    def is_forwarded_from_group(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if the message was forwarded from a group or a supergroup.
         :param obj: A Message or a CallbackQuery object.
@@ -262,10 +333,10 @@ class BuiltInFilters:
         if not isinstance(obj, Message):
             return False
 
-        return obj.forward_from_chat and obj.forward_from_chat.type in ['group', 'supergroup']
+        return bool(obj.forward_from_chat and obj.forward_from_chat.type in ['group', 'supergroup'])
 
     @staticmethod
-    async def is_forwarded_from_channel(obj: Union[Message, CallbackQuery]) -> bool:
+    def is_forwarded_from_channel(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message is forwarded from a channel.
         :param obj: A Message or CallbackQuery object.
@@ -274,10 +345,10 @@ class BuiltInFilters:
         if not isinstance(obj, Message):
             return False
 
-        return obj.forward_from_chat and obj.forward_from_chat.type == 'channel'
+        return bool(obj.forward_from_chat and obj.forward_from_chat.type == 'channel')
 
     @staticmethod
-    async def is_forwarded_from_user(obj: Union[Message, CallbackQuery]) -> bool:
+    def is_forwarded_from_user(obj: Union[Message, CallbackQuery]) -> bool:
         """
         Checks if message is forwarded from a user.
         :param obj: A Message or CallbackQuery object.
@@ -291,3 +362,126 @@ class BuiltInFilters:
     @property
     def to_list(self):
         return [method.replace('is_', '') for method in dir(self) if not method.startswith(('_', 'to_list'))]
+
+
+def _parse_range(value: str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Parse a range of `1..100` format, either bound may be omitted.
+    """
+    low, high = value.split('..', 1)
+    return int(low) if low else None, int(high) if high else None
+
+
+def _int_range(value: str) -> SyncCheck:
+    low, high = _parse_range(value)
+
+    def check(obj: Union[Message, CallbackQuery]) -> bool:
+        number = _to_int(obj)
+        return number is not None and (low is None or number >= low) and (high is None or number <= high)
+    return check
+
+
+def _len_range(value: str) -> SyncCheck:
+    low, high = _parse_range(value)
+
+    def check(obj: Union[Message, CallbackQuery]) -> bool:
+        text = _text(obj)
+        return text is not None and (low is None or len(text) >= low) and (high is None or len(text) <= high)
+    return check
+
+
+def _regex(value: str) -> SyncCheck:
+    pattern = re.compile(value)
+
+    def check(obj: Union[Message, CallbackQuery]) -> bool:
+        text = _text(obj)
+        return bool(text and pattern.fullmatch(text))
+    return check
+
+
+class CompiledFilters:
+    """
+    Filters of a menu compiled into a single predicate, input passes if any of the filters passes.
+    """
+    __slots__ = ('sync_checks', 'checks')
+
+    def __init__(self, sync_checks: Tuple[SyncCheck, ...], checks: Tuple[Callable[..., Any], ...]):
+        self.sync_checks: Tuple[SyncCheck, ...] = sync_checks
+        self.checks: Tuple[Callable[..., Any], ...] = checks  # User filters, awaited if they return an awaitable
+
+    async def check(self, obj: Union[Message, CallbackQuery]) -> bool:
+        for check in self.sync_checks:
+            if check(obj):
+                return True
+        for check in self.checks:
+            result = check(obj)
+            if inspect.isawaitable(result):
+                result = await result
+            if result:
+                return True
+        return False
+
+
+class FilterEngine:
+    """
+    Compiles menu filters once per set of filter names.
+    Built-in filters run synchronously, parametrized filters are written as `name:value`, e.g. `int_range:1..100`.
+    """
+    parametrized: Dict[str, Callable[[str], SyncCheck]] = {
+        'int_range': _int_range,
+        'len_range': _len_range,
+        'len_min': lambda value: _len_range(f'{value}..'),
+        'len_max': lambda value: _len_range(f'..{value}'),
+        'regex': _regex
+    }
+
+    def __init__(self, filters: Dict[str, Callable[..., Any]]):
+        """
+        Initialize FilterEngine.
+        :param filters: Filters attached to a Neko.
+        """
+        self.filters: Dict[str, Callable[..., Any]] = filters
+        self._compiled: Dict[Tuple[str, ...], CompiledFilters] = dict()
+
+    def _compile_filter(self, name: str) -> Tuple[Optional[SyncCheck], Optional[Callable[..., Any]]]:
+        callback = self.filters.get(name)
+        if callback is not None:
+            if hasattr(callback, 'sync_check'):  # Built-in filter
+                return callback.sync_check, None
+            return None, callback
+        if ':' in name:
+            key, value = name.split(':', 1)
+            if key in self.parametrized:
+                try:
+                    return self.parametrized[key](value), None
+                except (ValueError, re.error) as e:
+                    LOGGER.warning(f'Filter {name} has an invalid value: {e} *hisses*')
+                    return None, None
+        LOGGER.warning(f'Filter {name} is not attached, input never passes it. *confused meow*')
+        return None, None
+
+    def compile(self, names: List[str]) -> CompiledFilters:
+        """
+        Get a compiled predicate for a list of filter names.
+        :param names: Filter names as defined in a menu.
+        :return: Compiled filters.
+        """
+        key = tuple(names)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            sync_checks: List[SyncCheck] = list()
+            checks: List[Callable[..., Any]] = list()
+            for name in key:
+                sync_check, check = self._compile_filter(name)
+                if sync_check is not None:
+                    sync_checks.append(sync_check)
+                elif check is not None:
+                    checks.append(check)
+            compiled = self._compiled[key] = CompiledFilters(tuple(sync_checks), tuple(checks))
+        return compiled
+
+    def invalidate(self) -> None:
+        """
+        Drop compiled filters, has to be called when filters are attached.
+        """
+        self._compiled.clear()
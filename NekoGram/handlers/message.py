@@ -1,7 +1,7 @@
-from aiogram import types, exceptions as aiogram_exc
+from aiogram import types
 from typing import Union, Dict, Any, Optional
-from contextlib import suppress
 
+from ..webhook_reply import reply_in_webhook
 from ..logger import LOGGER
 import NekoGram
 
@@ -9,7 +9,8 @@ import NekoGram
 async def _start_handler(message: types.Message):
     neko: NekoGram.Neko = message.conf['neko']
 
-    if not await neko.storage.check_user_exists(user_id=message.from_user.id):
+    blocked: Optional[bool] = await neko.storage.check_user_blocked(user_id=message.from_user.id)
+    if blocked is None:  # New user
         lang = message.from_user.language_code
         await neko.storage.create_user(
             user_id=message.from_user.id,
@@ -17,6 +18,11 @@ async def _start_handler(message: types.Message):
             name=message.from_user.full_name,
             username=message.from_user.username
         )
+    elif blocked:  # Reset user data on start, a user who blocked the bot before is reachable again
+        await NekoGram.utils.gather_ordered(
+            neko.storage.set_user_data(user_id=message.from_user.id, bot_token=message.conf.get('request_token')),
+            neko.storage.set_user_blocked(user_id=message.from_user.id, blocked=False)
+        )
     else:  # Reset user data on start
         await neko.storage.set_user_data(user_id=message.from_user.id, bot_token=message.conf.get('request_token'))
 
@@ -28,10 +34,10 @@ async def _start_handler(message: types.Message):
         await neko.functions['start'](current_menu, message, neko)
         return
     else:
-        await current_menu.send_message()
+        with reply_in_webhook():
+            await current_menu.send_message()
         if neko.delete_messages:
-            with suppress(Exception):
-                await message.delete()
+            neko.deletion_queue.schedule(message.bot, chat_id=message.chat.id, message_id=message.message_id)
 
 
 async def menu_message_handler(message: types.Message):
@@ -50,37 +56,32 @@ async def menu_message_handler(message: types.Message):
             menu=current_menu.prev_menu or None, user_id=message.from_user.id, bot_token=bot_token
         )
         if neko.delete_messages:
-            last_message_id = await neko.storage.get_last_message_id(user_id=message.from_user.id)
-            try:
-                await neko.bot.delete_message(chat_id=message.from_user.id, message_id=last_message_id)
-            except (aiogram_exc.MessageCantBeDeleted, aiogram_exc.MessageToDeleteNotFound):
-                with suppress(Exception):
-                    await neko.bot.edit_message_reply_markup(chat_id=message.from_user.id, message_id=last_message_id)
+            neko.deletion_queue.schedule(
+                message.bot, chat_id=message.from_user.id, strip_markup=True,
+                message_id=await neko.storage.get_last_message_id(user_id=message.from_user.id)
+            )
 
         if neko.prev_menu_handlers.get(current_menu.name):
             current_menu.prev_menu = await neko.prev_menu_handlers[current_menu.name](current_menu)
         menu = await neko.build_menu(name=current_menu.prev_menu or 'start', obj=message)
         if menu is None:
             return
-        await menu.send_message()
+        with reply_in_webhook():
+            await menu.send_message()
 
         if neko.delete_messages:
-            with suppress(Exception):
-                await message.delete()
+            neko.deletion_queue.schedule(message.bot, chat_id=message.chat.id, message_id=message.message_id)
         return
 
     if current_menu.filters:  # Check filters
-        filters_passed: bool = False
-        for f in current_menu.filters:
-            if await neko.filters[f](message):
-                filters_passed = True
-                break
+        filters_passed: bool = await neko.filter_engine.compile(current_menu.filters).check(message)
     else:
         filters_passed: bool = True
 
     if not filters_passed:  # Wrong data provided
         current_menu.text = current_menu.validation_error
-        await current_menu.send_message()
+        with reply_in_webhook():
+            await current_menu.send_message()
         return
     else:
         user_data = await neko.storage.set_user_data(
@@ -114,4 +115,5 @@ async def menu_message_handler(message: types.Message):
     if neko.functions.get(next_menu.name) and not next_menu.filters:  # Execute a function in next menu if no filters
         await neko.functions[next_menu.name](next_menu, message, neko)
 
-    await next_menu.send_message()
+    with reply_in_webhook():
+        await next_menu.send_message()
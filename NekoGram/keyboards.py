@@ -0,0 +1,97 @@
+from typing import Optional, Union, Dict, Type, Hashable
+from aiogram.utils.payload import prepare_arg
+from collections import OrderedDict
+from aiogram import types
+
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+
+class CachedKeyboard:
+    """
+    A prebuilt keyboard shared between renders of a static menu, only kept serialized so it can not be modified.
+    """
+    __slots__ = ('markup_type', 'payload')
+
+    def __init__(self, markup: Union[types.InlineKeyboardMarkup, types.ReplyKeyboardMarkup]):
+        self.markup_type: Type[Union[types.InlineKeyboardMarkup, types.ReplyKeyboardMarkup]] = type(markup)
+        self.payload: str = prepare_arg(markup)  # Serialized exactly the way Bot API requests expect it
+
+    def build(self, row_width: int = 3) -> Union[types.InlineKeyboardMarkup, types.ReplyKeyboardMarkup]:
+        """
+        Build a new markup object from the keyboard.
+        :param row_width: Row width of buttons added to the markup later.
+        :return: Aiogram markup object.
+        """
+        markup = self.markup_type.to_object(json.loads(self.payload))
+        markup.row_width = row_width
+        return markup
+
+
+class KeyboardCache:
+    """
+    LRU cache of fully built keyboards for menus that render the same markup for every user.
+    Each Menu gets its own markup object built on first access, so changes never leak into the cache.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        """
+        Initialize KeyboardCache.
+        :param max_size: Max number of keyboards to keep, 0 disables caching.
+        """
+        self.max_size: int = max_size
+        self._version: Optional[int] = None
+        self._keyboards: Dict[Hashable, CachedKeyboard] = OrderedDict()
+
+    def _actualize(self, version: int) -> None:
+        """
+        Drop every keyboard if texts were reloaded since they were built.
+        :param version: Current text processor version.
+        """
+        if self._version != version:
+            self._keyboards.clear()
+            self._version = version
+
+    def get(self, key: Hashable, version: int) -> Optional[CachedKeyboard]:
+        """
+        Get a cached keyboard.
+        :param key: Keyboard key.
+        :param version: Current text processor version.
+        :return: CachedKeyboard if present, otherwise None.
+        """
+        self._actualize(version)
+        keyboard = self._keyboards.get(key)
+        if keyboard is not None:
+            self._keyboards.move_to_end(key)
+        return keyboard
+
+    def set(
+            self,
+            key: Hashable,
+            version: int,
+            markup: Union[types.InlineKeyboardMarkup, types.ReplyKeyboardMarkup]
+    ) -> CachedKeyboard:
+        """
+        Cache a keyboard.
+        :param key: Keyboard key.
+        :param version: Current text processor version.
+        :param markup: A built markup object.
+        :return: CachedKeyboard object.
+        """
+        self._actualize(version)
+        keyboard = CachedKeyboard(markup)
+        if self.max_size > 0:
+            self._keyboards[key] = keyboard
+            self._keyboards.move_to_end(key)
+            while len(self._keyboards) > self.max_size:
+                self._keyboards.popitem(last=False)
+        return keyboard
+
+    def clear(self) -> None:
+        self._keyboards.clear()
+        self._version = None
+
+    def __len__(self) -> int:
+        return len(self._keyboards)
@@ -0,0 +1,72 @@
+from typing import Optional, Dict, List, Tuple, Iterable
+
+from .text_processors import BaseProcessor
+from .logger import LOGGER
+
+
+class FallbackIndex:
+    """
+    Resolves which language to take a menu from when it is not translated to the user's language.
+    Resolutions are computed once per menu and language and dropped when texts change.
+    """
+
+    def __init__(self, processor: BaseProcessor, chains: Optional[Dict[str, Iterable[str]]] = None):
+        """
+        Initialize FallbackIndex.
+        :param processor: Text processor to resolve menus in.
+        :param chains: Fallback languages for each language in order of preference, e.g. `{'uk': ['ru', 'en']}`.
+        The default language and then every other language are tried after the chain.
+        """
+        self.processor: BaseProcessor = processor
+        self.chains: Dict[str, Tuple[str, ...]] = {lang: tuple(chain) for lang, chain in (chains or dict()).items()}
+        self._version: Optional[int] = None
+        self._default_language: Optional[str] = None
+        self._languages: Dict[str, Tuple[str, ...]] = dict()  # Full chains
+        self._resolved: Dict[Tuple[str, str], Optional[str]] = dict()
+
+    def _actualize(self, default_language: Optional[str]) -> None:
+        if self._version != self.processor.version or self._default_language != default_language:
+            self._languages.clear()
+            self._resolved.clear()
+            self._version = self.processor.version
+            self._default_language = default_language
+
+    def chain(self, lang: str) -> Tuple[str, ...]:
+        """
+        Get languages to look a menu up in for a language.
+        :param lang: User language.
+        :return: Languages in order of preference.
+        """
+        chain = self._languages.get(lang)
+        if chain is None:
+            candidates: List[str] = [lang, *self.chains.get(lang, ()), self._default_language, *self.processor.texts]
+            chain = self._languages[lang] = tuple(
+                language for language in dict.fromkeys(candidates) if language in self.processor.texts
+            )
+        return chain
+
+    def resolve(self, name: str, lang: str, default_language: Optional[str] = None) -> Optional[str]:
+        """
+        Find the language to take a menu from.
+        :param name: Menu name.
+        :param lang: User language.
+        :param default_language: Default language of the app.
+        :return: Language that has the menu or None if no language has it.
+        """
+        self._actualize(default_language)
+        key = (name, lang)
+        if key in self._resolved:
+            return self._resolved[key]
+
+        resolved: Optional[str] = None
+        for language in self.chain(lang):
+            if name in self.processor.texts[language]:
+                resolved = language
+                break
+        if resolved is not None and resolved != lang:
+            LOGGER.warning(f'{name} menu does not have {lang} translation, using {resolved}.')
+        self._resolved[key] = resolved
+        return resolved
+
+    def __len__(self) -> int:
+        return len(self._resolved)
@@ -0,0 +1,276 @@
+from typing import Optional, Dict, Any, Tuple
+from aiohttp import payload as aiohttp_payload
+from aiogram import types
+from collections import OrderedDict
+import hashlib
+import asyncio
+import mmap
+import io
+import os
+
+from .storages import BaseStorage
+from .logger import LOGGER
+
+
+def extract_file_id(msg: types.Message, media_type: str) -> Optional[str]:
+    """
+    Get a Telegram file ID of media sent in a message.
+    :param msg: A message sent with media.
+    :param media_type: Type of the media sent.
+    :return: File ID if found, otherwise None.
+    """
+    if msg.photo:
+        return msg.photo[-1].file_id
+    media = getattr(msg, media_type, None) or msg.document
+    return media.file_id if media else None
+
+
+class MediaReader(io.RawIOBase):
+    """
+    A read-only file object over a shared media buffer, nothing is copied until the data is read.
+    """
+
+    def __init__(self, buffer: memoryview, name: str, digest: Optional[str] = None):
+        super().__init__()
+        self._buffer: memoryview = buffer
+        self._position: int = 0
+        self.name: str = name
+        self.digest: Optional[str] = digest  # Content hash
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def getbuffer(self) -> memoryview:
+        """
+        Get the unread part of the media without copying it.
+        :return: memoryview object.
+        """
+        return self._buffer[self._position:]
+
+    @property
+    def size(self) -> int:
+        return len(self._buffer) - self._position
+
+    def readinto(self, b) -> int:
+        size = min(len(b), len(self._buffer) - self._position)
+        b[:size] = self._buffer[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._buffer) if size is None or size < 0 else min(self._position + size, len(self._buffer))
+        data = bytes(self._buffer[self._position:end])
+        self._position = max(end, self._position)
+        return data
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+        self._position = max(0, offset)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        if not self.closed:
+            self._buffer.release()
+        super().close()
+
+
+class MediaPayload(aiohttp_payload.Payload):
+    """
+    aiohttp payload that streams MediaReader buffers straight to the socket with a known size.
+    """
+    _chunk_size: int = 256 * 1024
+
+    def __init__(self, value: MediaReader, *args: Any, **kwargs: Any):
+        kwargs.setdefault('content_type', 'application/octet-stream')
+        super().__init__(value, *args, **kwargs)
+        self._size = value.size
+
+    async def write(self, writer) -> None:
+        view = self._value.getbuffer()
+        try:
+            for offset in range(0, len(view), self._chunk_size):
+                await writer.write(view[offset:offset + self._chunk_size])
+        finally:
+            view.release()
+            self._value.close()
+
+
+aiohttp_payload.PAYLOAD_REGISTRY.register(MediaPayload, MediaReader, order=aiohttp_payload.Order.try_first)
+
+
+class _MediaEntry:
+    __slots__ = ('path', 'buffer', 'size', 'digest')
+
+    def __init__(self, path: str, buffer: Any, size: int, digest: str):
+        self.path: str = path
+        self.buffer: Any = buffer  # mmap object or bytes for empty files
+        self.size: int = size
+        self.digest: str = digest
+
+
+class MediaCache:
+    """
+    Memory-mapped media files with a byte budget and LRU eviction.
+    Mappings are backed by the OS page cache, so worker processes serving the same files share memory.
+    Files are expected to be replaced atomically (new inode) rather than rewritten in place while mapped.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_file_ids: int = 16384):
+        """
+        Initialize MediaCache.
+        :param max_bytes: Max total size of cached files, 0 disables caching (files are mapped on every use).
+        :param max_file_ids: Max number of Telegram file IDs to keep in memory (all of them are kept in storage).
+        """
+        self.max_bytes: int = max_bytes
+        self.max_file_ids: int = max_file_ids
+        self.size: int = 0
+        self._entries: Dict[str, _MediaEntry] = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = dict()
+        self._file_ids: Dict[Tuple[int, str], Optional[str]] = OrderedDict()
+
+    @staticmethod
+    def _load(path: str) -> _MediaEntry:
+        """
+        Map a file into memory (blocking, meant to be run in a thread pool).
+        :param path: Path to the file.
+        :return: _MediaEntry object.
+        """
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return _MediaEntry(path=path, buffer=b'', size=0, digest=hashlib.blake2b(digest_size=16).hexdigest())
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(buffer, 'madvise') and hasattr(mmap, 'MADV_WILLNEED'):
+            buffer.madvise(mmap.MADV_WILLNEED)  # Start reading ahead while we are off the event loop
+        digest = hashlib.blake2b(buffer, digest_size=16).hexdigest()
+        return _MediaEntry(path=path, buffer=buffer, size=size, digest=digest)
+
+    def _store(self, entry: _MediaEntry) -> None:
+        """
+        Add an entry to the cache, evicting least recently used files to fit the budget.
+        :param entry: _MediaEntry object.
+        """
+        if entry.size > self.max_bytes:
+            return
+        if entry.path in self._entries:
+            self.size -= self._entries.pop(entry.path).size
+        self._entries[entry.path] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size  # Mapping is released once the last reader is closed
+
+    def _get(self, path: str) -> Optional[_MediaEntry]:
+        entry = self._entries.get(path)
+        if entry is not None:
+            self._entries.move_to_end(path)
+        return entry
+
+    @staticmethod
+    def _reader(entry: _MediaEntry) -> MediaReader:
+        return MediaReader(memoryview(entry.buffer), name=entry.path, digest=entry.digest)
+
+    async def open(self, path: str) -> MediaReader:
+        """
+        Get a reader for a media file, loading it in a thread pool if it is not cached.
+        :param path: Path to the file.
+        :return: MediaReader object.
+        """
+        entry = self._get(path)
+        if entry is None:
+            future = self._loading.get(path)
+            if future is None:  # Concurrent requests for the same file share a single load
+                future = asyncio.get_running_loop().run_in_executor(None, self._load, path)
+                self._loading[path] = future
+                try:
+                    entry = await future
+                    self._store(entry)
+                finally:
+                    self._loading.pop(path, None)
+            else:
+                entry = await asyncio.shield(future)
+        return self._reader(entry)
+
+    def open_sync(self, path: str) -> MediaReader:
+        """
+        Get a reader for a media file, blocking if it is not cached.
+        :param path: Path to the file.
+        :return: MediaReader object.
+        """
+        entry = self._get(path)
+        if entry is None:
+            entry = self._load(path)
+            self._store(entry)
+        return self._reader(entry)
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """
+        Drop a file or the whole cache.
+        :param path: Path to the file, None to drop everything.
+        """
+        if path is None:
+            self._entries.clear()
+            self.size = 0
+            LOGGER.info('Media cache cleared.')
+        elif path in self._entries:
+            self.size -= self._entries.pop(path).size
+
+    @staticmethod
+    def media_key(path: str, digest: str) -> str:
+        """
+        Get a key identifying a media file by its path and content.
+        :param path: Path to the file.
+        :param digest: Content hash of the file.
+        :return: Media key.
+        """
+        return hashlib.blake2b(f'{path}\0{digest}'.encode('utf-8'), digest_size=16).hexdigest()
+
+    async def get_file_id(self, storage: BaseStorage, bot_id: int, media_key: str) -> Optional[str]:
+        """
+        Get a Telegram file ID of previously uploaded media.
+        :param storage: Storage to look the file ID up in if it is not in memory.
+        :param bot_id: ID of the bot that uploaded the media.
+        :param media_key: Media key.
+        :return: File ID if the media was uploaded by this bot before, otherwise None.
+        """
+        key = (bot_id, media_key)
+        if key in self._file_ids:
+            self._file_ids.move_to_end(key)
+            return self._file_ids[key]
+        file_id = await storage.get_media_file_id(bot_id=bot_id, media_key=media_key)
+        self._remember_file_id(key, file_id)
+        return file_id
+
+    async def set_file_id(self, storage: BaseStorage, bot_id: int, media_key: str, file_id: Optional[str]) -> None:
+        """
+        Save or forget a Telegram file ID of uploaded media.
+        :param storage: Storage to persist the file ID in.
+        :param bot_id: ID of the bot that uploaded the media.
+        :param media_key: Media key.
+        :param file_id: File ID, None to forget it.
+        """
+        self._remember_file_id((bot_id, media_key), file_id)
+        await storage.set_media_file_id(bot_id=bot_id, media_key=media_key, file_id=file_id)
+
+    def _remember_file_id(self, key: Tuple[int, str], file_id: Optional[str]) -> None:
+        if self.max_file_ids <= 0:
+            return
+        self._file_ids[key] = file_id
+        self._file_ids.move_to_end(key)
+        while len(self._file_ids) > self.max_file_ids:
+            self._file_ids.popitem(last=False)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
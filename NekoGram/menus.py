@@ -1,10 +1,13 @@
-from typing import Optional, Union, Dict, List, Any, Type, Set, Iterable
+from typing import Optional, Union, Dict, List, Any, Type, Set, Iterable, Tuple, Callable, Awaitable
 from aiogram import types, exceptions as aiogram_exc
 from typing_extensions import deprecated  # noqa
 from contextlib import suppress
 from io import BytesIO
 
-from .utils import NekoGramWarning
+from .keyboards import CachedKeyboard
+from .media import MediaReader, extract_file_id
+from .utils import NekoGramWarning, get_bot_id, gather_ordered
+from .webhook_reply import reply_in_webhook
 from .base_neko import BaseNeko
 from .logger import LOGGER
 
@@ -19,6 +22,9 @@ class Menu:
         'menu': 'call_data'
     }
     __default_menu_values: Dict[str, str] = {'caption': 'text'}
+    __file_id_errors: Tuple[str, ...] = (
+        'file identifier', 'file_id', 'file reference', 'remote file', 'media_empty', 'web page content'
+    )
     __inline_markup_identifiers: List[str] = [
         'call_data',
         'callback_data',
@@ -41,8 +47,14 @@ class Menu:
         'animation': {'gif', 'webm'},
         'document': set()
     }
-
-    __cached_media: Dict[str, bytes] = dict()
+    __resolved_media_types: Dict[str, str] = dict()
+    __slots__ = (
+        'name', 'obj', 'neko', '_markup', 'text', '_init_media', '_media', '_media_type', '_media_validated',
+        'media_spoiler', 'protect_content', 'no_preview', 'parse_mode', 'silent', 'raw_markup', 'lang',
+        '_source_markup', '_keyboard', 'markup_row_width', 'validation_error', '_extras', '_extra_kwargs',
+        '_keyboard_values_to_format', 'markup_type', 'prev_menu', 'next_menu', 'filters', '_call_data', 'bot_token',
+        '_bot_id', 'intermediate_menu', '_break_execution', 'skip_media_validation'
+    )
 
     def __init__(
             self,
@@ -67,50 +79,84 @@ class Menu:
             media_type: Optional[str] = None,
             media_spoiler: Optional[bool] = None,
             protect_content: Optional[bool] = None,
+            lang: Optional[str] = None,
+            source_markup: Optional[List[List[Dict[str, str]]]] = None,
             **kwargs
     ):
         self.name: str = name
         self.obj: Optional[Union[types.Message, types.CallbackQuery, types.InlineQuery]] = obj
         self.neko: BaseNeko = obj.conf['neko']
-        self.markup: Optional[Union[types.InlineKeyboardMarkup, types.ReplyKeyboardMarkup]] = None
+        self._markup: Optional[Union[types.InlineKeyboardMarkup, types.ReplyKeyboardMarkup]] = None
 
         self.text: Optional[str] = text
         self._init_media: Optional[Union[str, BytesIO]] = media
-        self._media: Optional[Union[str, BytesIO]] = media
+        self._media: Optional[Union[str, BytesIO, MediaReader]] = media
         self._media_type: Optional[str] = media_type
+        self._media_validated: bool = False  # Media is validated on first access
         self.media_spoiler: Optional[bool] = media_spoiler
         self.protect_content: Optional[bool] = protect_content
         self.no_preview: Optional[bool] = no_preview
         self.parse_mode: Optional[str] = parse_mode
         self.silent: Optional[bool] = silent
         self.raw_markup: Optional[List[List[Dict[str, str]]]] = markup
+        self.lang: Optional[str] = lang
+        self._source_markup: Optional[List[List[Dict[str, str]]]] = source_markup
+        self._keyboard: Optional[CachedKeyboard] = None
         self.markup_row_width: Optional[int] = markup_row_width
         self.validation_error: str = validation_error or 'ValidationError'
-        self.extras: Dict[str, Any] = kwargs.pop('extras', dict())
-        self.keyboard_values_to_format = keyboard_values_to_format or list(self.__default_keyboard_values.keys())
+        self._extras: Optional[Dict[str, Any]] = kwargs.pop('extras', None)
+        self._extra_kwargs: Optional[Dict[str, Any]] = kwargs or None  # Merged into extras on first access
+        self._keyboard_values_to_format: Optional[List[str]] = keyboard_values_to_format
         self.markup_type: Optional[str] = markup_type
         self.prev_menu: Optional[str] = prev_menu
         self.next_menu: Optional[str] = next_menu
         self.filters: Optional[List[str]] = filters
         self._call_data: Optional[Union[str, int]] = callback_data
         self.bot_token: Optional[str] = bot_token
-        self.bot_id: Optional[int] = None
+        self._bot_id: Optional[int] = None
         self.intermediate_menu: Optional[str] = intermediate_menu
         self._break_execution: bool = False
         self.skip_media_validation: bool = False
 
-        self.extras.update(kwargs)
+    @property
+    def extras(self) -> Dict[str, Any]:
+        if self._extras is None or self._extra_kwargs is not None:
+            extras = self._extras if self._extras is not None else dict()
+            if self._extra_kwargs:
+                extras.update(self._extra_kwargs)
+            self._extras, self._extra_kwargs = extras, None
+        return self._extras
+
+    @extras.setter
+    def extras(self, value: Dict[str, Any]):
+        self._extras, self._extra_kwargs = value, None
 
-        if self.bot_token:
-            self.bot_id = int(self.bot_token.split(':')[0])
+    @property
+    def keyboard_values_to_format(self) -> List[str]:
+        if self._keyboard_values_to_format is None:
+            self._keyboard_values_to_format = list(self.__default_keyboard_values.keys())
+        return self._keyboard_values_to_format
 
-        self.validate_media()
+    @keyboard_values_to_format.setter
+    def keyboard_values_to_format(self, value: List[str]):
+        self._keyboard_values_to_format = value
+
+    @property
+    def bot_id(self) -> Optional[int]:
+        if self._bot_id is None and self.bot_token:
+            self._bot_id = int(self.bot_token.split(':')[0])
+        return self._bot_id
+
+    @bot_id.setter
+    def bot_id(self, value: Optional[int]):
+        self._bot_id = value
 
     def validate_media(self) -> None:
         """
         Validate and process media.
         """
-        if self.skip_media_validation or not self.media:
+        self._media_validated = True
+        if self.skip_media_validation or not self._init_media:
             return
         if self._media_type and self._media_type not in self.__media_extensions.keys():
             raise ValueError(
@@ -118,24 +164,41 @@ class Menu:
                 f'Valid options: {", ".join(self.__media_extensions.keys())}'
             )
         else:
-            self._media_type = self.resolve_media_type(self._media)
-        self.resolve_media()
+            self._media_type = self.resolve_media_type(self._init_media)
 
     @classmethod
     def resolve_media_type(cls, path_or_url: str) -> str:
-        part: str = path_or_url.split('.')[-1].lower().split('?')[0]
-        for key, value in cls.__media_extensions.items():
-            if part in value:
-                return key
-        return 'document'
+        media_type = cls.__resolved_media_types.get(path_or_url)
+        if media_type is None:
+            media_type = 'document'
+            part: str = path_or_url.split('.')[-1].lower().split('?')[0]
+            for key, value in cls.__media_extensions.items():
+                if part in value:
+                    media_type = key
+                    break
+            if len(cls.__resolved_media_types) < 4096:
+                cls.__resolved_media_types[path_or_url] = media_type
+        return media_type
+
+    @property
+    def _has_local_media(self) -> bool:
+        return isinstance(self._init_media, str) and not self.skip_media_validation \
+            and not self._init_media.startswith(('http://', 'https://'))
 
     def resolve_media(self) -> None:
-        if self.skip_media_validation or self._init_media.startswith(('http://', 'https://')):  # noqa
-            return
-        if not self.__cached_media.get(self._init_media):
-            with open(self._init_media, 'rb') as f:
-                self.__cached_media[self._init_media] = f.read()
-        self._media = BytesIO(self.__cached_media[self._init_media])
+        """
+        Open local media synchronously (blocks the event loop on a cache miss, prefer `load_media`).
+        """
+        if self._has_local_media:
+            self._media = self.neko.media_cache.open_sync(self._init_media)
+
+    async def load_media(self) -> None:
+        """
+        Open local media through the media cache without blocking the event loop.
+        A new reader is created every time, so the media can be sent repeatedly.
+        """
+        if self._has_local_media:
+            self._media = await self.neko.media_cache.open(self._init_media)
 
     @property
     def media(self):
@@ -149,13 +212,42 @@ class Menu:
 
     @property
     def media_type(self):
+        if not self._media_validated:
+            self.validate_media()
         return self._media_type
 
     @media_type.setter
     def media_type(self, value: str):
         self._media_type = value.lower()
+        self._media_validated = True
         self.validate_media()
 
+    @property
+    def markup(self) -> Optional[Union[types.InlineKeyboardMarkup, types.ReplyKeyboardMarkup]]:
+        if self._markup is None and self._keyboard is not None:  # A copy of the cached keyboard
+            self._markup = self._keyboard.build(row_width=self.markup_row_width or 3)
+        return self._markup
+
+    @markup.setter
+    def markup(self, value: Optional[Union[types.InlineKeyboardMarkup, types.ReplyKeyboardMarkup]]):
+        self._markup, self._keyboard = value, None
+
+    @property
+    def has_markup(self) -> bool:
+        """
+        Whether the menu has markup, unlike `markup` does not build markup of a cached keyboard.
+        """
+        return self._markup is not None or self._keyboard is not None
+
+    @property
+    def _reply_markup(self) -> Optional[Union[types.InlineKeyboardMarkup, types.ReplyKeyboardMarkup, str]]:
+        """
+        Markup to pass to Bot API methods, pre-serialized if it comes from the keyboard cache and was not accessed.
+        """
+        if self._markup is None and self._keyboard is not None:
+            return self._keyboard.payload
+        return self._markup
+
     def break_execution(self):
         self._break_execution = True
 
@@ -163,24 +255,54 @@ class Menu:
     def is_broken(self) -> bool:
         return self._break_execution
 
-    @staticmethod
-    def _apply_formatting(formatting: Optional[Union[List[Any], Dict[str, Any], Any]] = None, *items) -> List[str]:
+    def _apply_formatting(self, formatting: Optional[Union[List[Any], Dict[str, Any], Any]] = None,
+                          *items) -> List[str]:
         result = list()
         for item in items:
-            if item is None:
+            if item is None or formatting is None:
                 result.append(item)
-                continue
-
-            if isinstance(formatting, list):
+            elif isinstance(item, str):
+                result.append(self.neko.text_processor.get_template(item, self.lang).format(formatting))
+            elif isinstance(formatting, list):
                 result.append(item.format(*formatting))
             elif isinstance(formatting, dict):
                 result.append(item.format(**formatting))
-            elif formatting is not None:
-                result.append(item.format(formatting))
             else:
-                result.append(item)
+                result.append(item.format(formatting))
         return result
 
+    async def _send_media(self, send: Callable[[Any], Awaitable[types.Message]]) -> types.Message:
+        """
+        Send or edit media reusing a Telegram file ID of local media uploaded before.
+        :param send: A function that performs the request with the media passed to it.
+        :return: Sent or edited message.
+        """
+        await self.load_media()
+        media_key: Optional[str] = None
+        if self.neko.reuse_media_file_ids and isinstance(self._media, MediaReader):
+            media_key = self.neko.media_cache.media_key(path=self._init_media, digest=self._media.digest)
+            bot_id = self.bot_id or get_bot_id(self.obj.bot)
+            file_id = await self.neko.media_cache.get_file_id(self.neko.storage, bot_id=bot_id, media_key=media_key)
+            if file_id:
+                try:
+                    return await send(file_id)
+                except aiogram_exc.BadRequest as e:
+                    if not any(i in str(e).lower() for i in self.__file_id_errors):
+                        raise e
+                    LOGGER.warning(f'Telegram rejected a cached file ID of {self._init_media}, uploading it again.')
+                    await self.neko.media_cache.set_file_id(
+                        self.neko.storage, bot_id=bot_id, media_key=media_key, file_id=None
+                    )
+
+        msg = await send(self._media)
+        if media_key is not None and isinstance(msg, types.Message):
+            file_id = extract_file_id(msg, media_type=self.media_type)
+            if file_id:
+                await self.neko.media_cache.set_file_id(
+                    self.neko.storage, bot_id=bot_id, media_key=media_key, file_id=file_id
+                )
+        return msg
+
     async def send_message(self, user_id: Optional[int] = None, ignore_media: bool = False) -> types.Message:
         """
         Sends the menu as a message to a user.
@@ -191,30 +313,33 @@ class Menu:
         if user_id is None:
             user_id = self.obj.from_user.id
         if self.media and not ignore_media:
-            msg = await getattr(self.obj.bot, f'send_{self._media_type}')(**{
-                self.media_type: self.media,
+            send = self._send_media(lambda media: getattr(self.obj.bot, f'send_{self.media_type}')(**{
+                self.media_type: media,
                 'chat_id': user_id,
                 'caption': self.text,
                 'parse_mode': self.parse_mode,
                 'disable_notification': self.silent,
-                'reply_markup': self.markup,
+                'reply_markup': self._reply_markup,
                 'protect_content': self.protect_content
-            })
+            }))
         else:
-            msg = await self.obj.bot.send_message(
+            send = self.obj.bot.send_message(
                 chat_id=user_id,
                 text=self.text,
                 protect_content=self.protect_content,
                 parse_mode=self.parse_mode,
                 disable_web_page_preview=self.no_preview,
                 disable_notification=self.silent,
-                reply_markup=self.markup,
+                reply_markup=self._reply_markup,
             )
-        if self.neko.delete_messages:
-            last_message_id = await self.neko.storage.get_last_message_id(user_id=user_id)
-            await self.neko.storage.set_last_message_id(user_id=user_id, message_id=msg.message_id)
-            with suppress(Exception):
-                await self.obj.bot.delete_message(chat_id=user_id, message_id=last_message_id)
+        if not self.neko.delete_messages:
+            return await send
+
+        # Look the previous message up while sending, a failed send is reported before a failed lookup
+        with reply_in_webhook(False):  # The message ID is needed
+            msg, last_message_id = await gather_ordered(send, self.neko.storage.get_last_message_id(user_id=user_id))
+        await self.neko.storage.set_last_message_id(user_id=user_id, message_id=msg.message_id)
+        self.neko.deletion_queue.schedule(self.obj.bot, chat_id=user_id, message_id=last_message_id)
         return msg
 
     async def edit_message(self, ignore_media: bool = False) -> types.Message:
@@ -226,42 +351,45 @@ class Menu:
         obj = self.obj if isinstance(self.obj, types.Message) else self.obj.message
         if self.media:
             if ignore_media:
-                msg = await obj.edit_caption(caption=self.text, parse_mode=self.parse_mode, reply_markup=self.markup)
+                msg = await obj.edit_caption(
+                    caption=self.text, parse_mode=self.parse_mode, reply_markup=self._reply_markup
+                )
             else:
                 try:
-                    msg = await obj.edit_media(
-                        media=getattr(types, f'InputMedia{self._media_type.capitalize()}')(
-                            media=self.media,
+                    msg = await self._send_media(lambda media: obj.edit_media(
+                        media=getattr(types, f'InputMedia{self.media_type.capitalize()}')(
+                            media=media,
                             caption=self.text,
                             parse_mode=self.parse_mode,
                             has_spoiler=self.media_spoiler
                         ),
-                        reply_markup=self.markup
-                    )
+                        reply_markup=self._reply_markup
+                    ))
                 except aiogram_exc.BadRequest as e:
                     if str(e) == 'There is no media in the message to edit':
                         try:
                             await obj.delete()
                         except Exception:  # noqa
                             await obj.edit_reply_markup()
-                        self.resolve_media()
-                        msg = await getattr(obj, f'answer_{self._media_type}')(**{
-                            self._media_type: self.media,
+                        msg = await self._send_media(lambda media: getattr(obj, f'answer_{self.media_type}')(**{
+                            self.media_type: media,
                             'caption': self.text,
                             'parse_mode': self.parse_mode,
-                            'reply_markup': self.markup
-                        })
+                            'reply_markup': self._reply_markup
+                        }))
                     else:
                         raise e
         else:
             msg = await obj.edit_text(
                 text=self.text,
                 parse_mode=self.parse_mode,
-                reply_markup=self.markup,
+                reply_markup=self._reply_markup,
                 disable_web_page_preview=self.no_preview
             )
-        if isinstance(self.obj, types.CallbackQuery):
-            await self.neko.storage.set_last_message_id(user_id=self.obj.from_user.id, message_id=msg.message_id)
+        if isinstance(self.obj, types.CallbackQuery):  # Edited text keeps its message ID
+            await self.neko.storage.set_last_message_id(
+                user_id=self.obj.from_user.id, message_id=msg.message_id if self.media else obj.message_id
+            )
         return msg
 
     @deprecated(
@@ -335,6 +463,8 @@ class Menu:
                     for item in self.keyboard_values_to_format:
                         if button.get(item):
                             button[item] = self._apply_formatting(markup_format, button[item])[0]
+                if button.get('callback_data') and self.neko.callback_codec is not None:
+                    button['callback_data'] = self.neko.callback_codec.encode(button['callback_data'])
                 buttons.append(button_type(**button))
             markup.add(*buttons)
         return markup
@@ -364,6 +494,15 @@ class Menu:
         if self.text:
             self.text = self._apply_formatting(text_format, self.text)[0]
 
+        keyboard_key: Optional[Tuple[Any, ...]] = None
+        if markup is None and self.raw_markup is not None:  # Try to reuse a static keyboard
+            keyboard_key = self._keyboard_cache_key(markup_format=markup_format, allowed_buttons=allowed_buttons)
+            if keyboard_key is not None:
+                keyboard = self.neko.keyboard_cache.get(keyboard_key, self.neko.text_processor.version)
+                if keyboard is not None:
+                    self._markup, self._keyboard = None, keyboard
+                    return
+
         if markup is None and self.raw_markup is not None:  # Resolve markup type
             markup_type = await self._resolve_markup_type()
             if markup_type == types.ReplyKeyboardMarkup:
@@ -377,6 +516,32 @@ class Menu:
                 markup_format=markup_format,
                 allowed_buttons=allowed_buttons
             )
+            if keyboard_key is not None:  # The cache keeps its own copy
+                self.neko.keyboard_cache.set(keyboard_key, self.neko.text_processor.version, self.markup)
+
+    def _keyboard_cache_key(
+            self,
+            markup_format: Optional[Union[List[Any], Dict[str, Any], Any]],
+            allowed_buttons: Optional[Iterable[Union[str, int]]]
+    ) -> Optional[Tuple[Any, ...]]:
+        """
+        Get a keyboard cache key if the markup is the same for every user.
+        :param markup_format: Formatting for markup buttons.
+        :param allowed_buttons: An iterable of allowed button IDs.
+        :return: A hashable key or None if the keyboard can not be cached.
+        """
+        if markup_format or self.lang is None or self.neko.keyboard_cache.max_size <= 0:
+            return None
+        if self._source_markup is None or self.raw_markup != self._source_markup:  # Overridden or paginated
+            return None
+        if isinstance(allowed_buttons, Iterable) and not isinstance(allowed_buttons, str):
+            try:
+                allowed_buttons = frozenset(allowed_buttons)
+            except TypeError:  # Unhashable button IDs
+                return None
+        else:
+            allowed_buttons = None
+        return self.name, self.lang, allowed_buttons, self.markup_type, self.markup_row_width
 
     @property
     def call_data(self) -> Optional[Any]:
@@ -400,19 +565,20 @@ class Menu:
         :param prev: text for a button which leads to the previous page.
         :param next: text for a button which leads to the next page.
         """
-        if self.markup:
+        if self.has_markup:
             return LOGGER.warning(f'Pagination was not applied for {self.name} since the menu is already built!')
         index_to_insert = len(self.raw_markup) - shift_last
+        delimiter = self.neko.callback_parameters_delimiter
         if offset >= limit and found > limit:
             self.raw_markup[index_to_insert: index_to_insert] = [[
-                {'call_data': f'{self.name}#{offset - limit}', 'text': prev},
-                {'call_data': f'{self.name}#{offset + limit}', 'text': next}
+                {'call_data': f'{self.name}{delimiter}{offset - limit}', 'text': prev},
+                {'call_data': f'{self.name}{delimiter}{offset + limit}', 'text': next}
             ]]
         elif offset >= limit:
             self.raw_markup[index_to_insert: index_to_insert] = [[
-                {'call_data': f'{self.name}#{offset - limit}', 'text': prev}
+                {'call_data': f'{self.name}{delimiter}{offset - limit}', 'text': prev}
             ]]
         elif found > limit:
             self.raw_markup[index_to_insert: index_to_insert] = [[
-                {'call_data': f'{self.name}#{offset + limit}', 'text': next}
+                {'call_data': f'{self.name}{delimiter}{offset + limit}', 'text': next}
             ]]
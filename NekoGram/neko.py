@@ -2,8 +2,9 @@ from typing import Dict, List, Union, Optional, Any, Callable, Awaitable
 from aiogram.dispatcher.filters import Filter
 from aiogram import Dispatcher, Bot, types
 from typing_extensions import deprecated  # noqa
+from contextlib import suppress
 from datetime import datetime
-from copy import deepcopy
+import asyncio
 import inspect
 import os
 
@@ -12,12 +13,16 @@ try:
 except ImportError:
     import json
 
-from .utils import HandlerInjector, NekoGramWarning
-from .webhook import KittyWebhook, KittyExecutor
+from .utils import HandlerInjector, NekoGramWarning, copy_tree, get_bot_id
+from .webhook import KittyWebhook, KittyExecutor, UpdateQueue
+from .webhook_reply import WebhookReply
+from .bots import BotPool
 from .text_processors import BaseProcessor
 from .storages import BaseStorage
 from .base_neko import BaseNeko
 from .router import NekoRouter
+from .media import MediaReader, extract_file_id
+from .ratelimit import RateLimiter
 from .logger import LOGGER
 from .menus import Menu
 
@@ -42,7 +47,16 @@ class Neko(BaseNeko):
             webhook_host: str = 'localhost',
             webhook_port: Optional[int] = None,
             webhook_path: Optional[str] = None,
-            webhook_url: Optional[str] = None
+            webhook_url: Optional[str] = None,
+            keyboard_cache_size: int = 1024,
+            media_cache_size: int = 64 * 1024 * 1024,
+            reuse_media_file_ids: bool = True,
+            language_fallbacks: Optional[Dict[str, List[str]]] = None,
+            compact_callback_data: bool = False,
+            rate_limiter: Optional[RateLimiter] = None,
+            update_queue: Optional[UpdateQueue] = None,
+            reply_in_webhook_response: bool = True,
+            bot_pool_size: int = 1024
     ):
         super().__init__(
             storage=storage,
@@ -51,7 +65,13 @@ class Neko(BaseNeko):
             dp=dp,
             text_processor=text_processor,
             menu_prefixes=menu_prefixes,
-            callback_parameters_delimiter=callback_parameters_delimiter
+            callback_parameters_delimiter=callback_parameters_delimiter,
+            keyboard_cache_size=keyboard_cache_size,
+            media_cache_size=media_cache_size,
+            reuse_media_file_ids=reuse_media_file_ids,
+            language_fallbacks=language_fallbacks,
+            compact_callback_data=compact_callback_data,
+            rate_limiter=rate_limiter
         )
         if attach_required_middleware:
             self.dp.middleware.setup(HandlerInjector(self))  # Set up the handler injector middleware
@@ -67,10 +87,16 @@ class Neko(BaseNeko):
         self.widgets: List[str] = list()
         self.__widget_data: Dict[str, Any] = dict()
         self.executor: KittyExecutor = KittyExecutor(neko=self)
+        self.update_queue: Optional[UpdateQueue] = update_queue  # Process webhook updates after responding
+        if update_queue is not None:
+            self.executor.on_shutdown(update_queue.close, polling=False)  # Drain before deletions are flushed
+        self.executor.on_shutdown(self.deletion_queue.close, polling=False)
         self.__webhook_host: str = webhook_host
         self.__webhook_port: Optional[int] = webhook_port
         self.__webhook_path: Optional[str] = webhook_path
         self.__webhook_url: Optional[str] = webhook_url
+        self.reply_in_webhook_response: bool = reply_in_webhook_response
+        self.bot_pool: BotPool = BotPool(self.bot, max_size=bot_pool_size)  # Child bots of the webhook
         if webhook_path and '{token}' not in webhook_path:
             raise ValueError('{token} placeholder has to be present in webhook_path.')
 
@@ -81,6 +107,7 @@ class Neko(BaseNeko):
         if isinstance(callback, Filter):
             callback = callback.check
         self.filters[name] = callback
+        self.filter_engine.invalidate()
 
     @deprecated(
         'The `add_filter` method is deprecated and may be removed in future updates, use `attach_filter` instead.',
@@ -255,23 +282,24 @@ class Neko(BaseNeko):
 
         if lang is None:
             lang = await self.storage.get_user_language(user_id=user_id or obj.from_user.id)
-        text: Dict[str, Any] = deepcopy(self.text_processor.texts[lang].get(name))
-        if text is None:  # Try to fetch the menu in another language
-            text = self.text_processor.texts[self.storage.default_language].get(name)
-            if text is None:
-                for language in self.text_processor.texts.keys():
-                    text = self.text_processor.texts[language].get(name)
-                    if text:
-                        LOGGER.warning(f'{name} menu does not have {lang} translation, using {language}.')
-                        break
-            else:
-                LOGGER.warning(f'{name} menu does not have {lang} translation, using en.')
-            if text is None:
-                raise RuntimeError(f'There is no menu called {name}! *facePAWm*')
-        if text and text.get('text') is None and text.get('media') is None:
+        text_lang = self.language_fallbacks.resolve(
+            name=name, lang=lang, default_language=self.storage.default_language if self.storage else None
+        )
+        if text_lang is None:
+            raise RuntimeError(f'There is no menu called {name}! *facePAWm*')
+        source: Dict[str, Any] = self.text_processor.texts[text_lang][name]
+        if source and source.get('text') is None and source.get('media') is None:
             LOGGER.warning(f'No text or media provided for {name}. *suspicious stare*')
 
-        text.update(dict(name=name, obj=obj, callback_data=callback_data, bot_token=obj.conf.get('request_token')))
+        text: Dict[str, Any] = copy_tree(source)  # Texts share values between menus and languages
+        text.update(dict(
+            name=name,
+            obj=obj,
+            callback_data=callback_data,
+            bot_token=obj.conf.get('request_token'),
+            lang=text_lang,
+            source_markup=source.get('markup')
+        ))
         menu = Menu(**text)
 
         if self._markup_overriders.get(name, dict()).get(lang):
@@ -282,7 +310,7 @@ class Neko(BaseNeko):
             r = await format_func(menu, obj.from_user, self)
             if isinstance(r, Menu):  # Replace the menu if required
                 menu = r
-            if menu.markup is None and menu.raw_markup:
+            if not menu.has_markup and menu.raw_markup:
                 await menu.build()
         elif auto_build:
             await menu.build()
@@ -379,6 +407,101 @@ class Neko(BaseNeko):
                 )
         LOGGER.info(f'{formatters_router.name.capitalize()} widget attached successfully')
 
+    def _collect_media(self) -> Dict[str, str]:
+        """
+        Find local media used by menus of loaded languages, other languages are not parsed for this in lazy mode.
+        :return: A dict of media paths and their types.
+        """
+        default_language = self.storage.default_language if self.storage else None
+        if default_language in self.text_processor.index:
+            self.text_processor.get_language(default_language)
+        media: Dict[str, str] = dict()
+        for texts in list(self.text_processor.loaded_languages.values()):
+            for menu in texts.values():
+                if not isinstance(menu, dict) or menu.get('skip_media_validation'):
+                    continue
+                path = menu.get('media')
+                if not isinstance(path, str) or not path or path.startswith(('http://', 'https://')):
+                    continue
+                media.setdefault(path, Menu.resolve_media_type(path))  # Resolved the same way Menu does it
+        return media
+
+    async def warm_up_media(
+            self,
+            cache_chat_id: Optional[int] = None,
+            concurrency: int = 4,
+            progress: Optional[Callable[[int, int], Any]] = None
+    ) -> Dict[str, int]:
+        """
+        Preload and validate local media of all loaded menus, meant to be called on startup before traffic arrives.
+        :param cache_chat_id: A chat to pre-upload media to, so Telegram file IDs are known before the first user.
+        :param concurrency: Max number of files processed at once.
+        :param progress: A function to call with numbers of processed and total files after each file.
+        :return: Numbers of total, loaded, uploaded and failed files.
+        """
+        media = self._collect_media()
+        report: Dict[str, int] = {'total': len(media), 'loaded': 0, 'uploaded': 0, 'failed': 0}
+        if not media:
+            return report
+        if cache_chat_id is not None and not self.reuse_media_file_ids:
+            LOGGER.warning('Media can not be pre-uploaded while reuse_media_file_ids is disabled. *sad meow*')
+            cache_chat_id = None
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        log_step: int = max(1, len(media) // 10)
+        done: int = 0
+
+        async def warm_up(path: str, media_type: str) -> None:
+            nonlocal done
+            async with semaphore:
+                try:
+                    reader = await self.media_cache.open(path)
+                    report['loaded'] += 1
+                    if cache_chat_id is not None and await self._upload_media(
+                            path=path, media_type=media_type, reader=reader, chat_id=cache_chat_id
+                    ):
+                        report['uploaded'] += 1
+                    else:
+                        reader.close()
+                except Exception as e:
+                    report['failed'] += 1
+                    LOGGER.warning(f'Failed to warm up media {path}: {e} *hisses*')
+            done += 1
+            if progress:
+                progress(done, report['total'])
+            if done % log_step == 0 or done == report['total']:
+                LOGGER.info(f'Media warm-up: {done}/{report["total"]} files processed')
+
+        await asyncio.gather(*[warm_up(path, media_type) for path, media_type in media.items()])
+        LOGGER.info(
+            f'Media warm-up finished: {report["loaded"]} loaded, {report["uploaded"]} uploaded, '
+            f'{report["failed"]} failed'
+        )
+        return report
+
+    async def _upload_media(self, path: str, media_type: str, reader: MediaReader, chat_id: int) -> bool:
+        """
+        Upload media to a cache chat and remember its file ID.
+        :param path: Path to the file.
+        :param media_type: Type of the media.
+        :param reader: MediaReader of the file.
+        :param chat_id: Cache chat ID.
+        :return: True if the media was uploaded, False if its file ID was already known.
+        """
+        bot_id = get_bot_id(self.bot)
+        media_key = self.media_cache.media_key(path=path, digest=reader.digest)
+        if await self.media_cache.get_file_id(self.storage, bot_id=bot_id, media_key=media_key):
+            return False
+        msg = await getattr(self.bot, f'send_{media_type}')(
+            **{media_type: reader, 'chat_id': chat_id, 'disable_notification': True}
+        )
+        file_id = extract_file_id(msg, media_type=media_type)
+        if file_id:
+            await self.media_cache.set_file_id(self.storage, bot_id=bot_id, media_key=media_key, file_id=file_id)
+        with suppress(Exception):
+            await msg.delete()  # File IDs stay valid, keep the cache chat clean
+        return bool(file_id)
+
     def start_webhook(self, loop=None):
         """
         Start webhook.
@@ -389,6 +512,10 @@ class Neko(BaseNeko):
                 'You must set webhook_host, webhook_host and webhook_port parameters for a Neko class '
                 'during initialization to run a webhook'
             )
+        if self.callback_codec is not None:
+            self.callback_codec.validate()
+        if self.reply_in_webhook_response and self.update_queue is None:  # Queued updates are answered right away
+            WebhookReply.install(self.bot)
         self.executor.start_webhook(
             webhook_path=self.__webhook_path,
             host=self.__webhook_host,
@@ -408,8 +535,6 @@ class Neko(BaseNeko):
         """
         if self.__webhook_url is None or '{token}' not in self.__webhook_url:
             raise RuntimeError('webhook_url must be specified and contain {token} placeholder to set a webhook.')
-        with self.bot.with_token(bot_token=bot_token, validate_token=validate_token):
-            await self.bot.set_webhook(
-                url=self.__webhook_url.format(token=bot_token), drop_pending_updates=drop_pending_updates
-            )
-            return await self.bot.get_me()
+        bot = self.bot_pool.get(bot_token, validate_token=validate_token)
+        await bot.set_webhook(url=self.__webhook_url.format(token=bot_token), drop_pending_updates=drop_pending_updates)
+        return await self.bot_pool.get_me(bot_token)
@@ -0,0 +1,376 @@
+from aiogram.utils import exceptions as aiogram_exc
+from typing import Optional, Dict, Tuple, Union, Any, Deque, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import deque
+from aiogram import Bot
+import asyncio
+import aiohttp
+import time
+
+from .logger import LOGGER
+
+ChatKey = Tuple[str, Union[int, str]]  # Bot token and chat ID
+LANES: Tuple[str, ...] = ('interactive', 'notification', 'bulk')  # In order of priority
+_lane: ContextVar[str] = ContextVar('nekogram_lane', default='interactive')
+TRANSIENT_ERRORS: Tuple[type, ...] = (
+    aiogram_exc.NetworkError,
+    aiogram_exc.RestartingTelegram,
+    aiohttp.ClientError,
+    asyncio.TimeoutError
+)  # Worth another attempt
+
+
+def get_lane() -> str:
+    """
+    Get the priority lane outbound requests of the current context are sent in.
+    """
+    return _lane.get()
+
+
+@contextmanager
+def use_lane(lane: str) -> Iterator[None]:
+    """
+    Send outbound requests made inside the block in a priority lane, e.g. `with use_lane('bulk'): ...`.
+    Tasks created inside the block inherit the lane.
+    :param lane: interactive (default), notification or bulk.
+    """
+    if lane not in LANES:
+        raise ValueError(f'Unknown lane {lane}, use one of: {", ".join(LANES)}')
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out tokens in advance: a request takes a token right away and waits until it is refilled.
+    """
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize TokenBucket.
+        :param rate: Tokens added per second.
+        :param capacity: Max number of tokens (burst size).
+        """
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self.tokens: float = capacity
+        self.updated: float = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """
+        Take a token.
+        :param now: Current monotonic time.
+        :return: Seconds to wait before the token may be used.
+        """
+        self._refill(now)
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def try_take(self, now: float) -> bool:
+        """
+        Take a token if one is available right away.
+        :param now: Current monotonic time.
+        :return: True if a token was taken.
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class LaneMetrics:
+    __slots__ = ('depth', 'admitted', 'total_wait', 'max_wait')
+
+    def __init__(self):
+        self.depth: int = 0  # Requests waiting right now
+        self.admitted: int = 0
+        self.total_wait: float = 0
+        self.max_wait: float = 0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            'depth': self.depth,
+            'admitted': self.admitted,
+            'avg_wait': self.total_wait / self.admitted if self.admitted else 0,
+            'max_wait': self.max_wait
+        }
+
+
+class LaneScheduler:
+    """
+    Hands out a global budget to waiting requests by lane priority, bulk requests get a reserved share of it.
+    """
+
+    def __init__(self, rate: float, bulk_share: float):
+        """
+        Initialize LaneScheduler.
+        :param rate: Requests per second.
+        :param bulk_share: Share of the budget bulk requests get while other lanes are busy.
+        """
+        self.bucket: TokenBucket = TokenBucket(rate=rate, capacity=rate)
+        self.bulk_share: float = bulk_share
+        self.queues: Dict[str, Deque[Tuple[asyncio.Future, float]]] = {lane: deque() for lane in LANES}
+        self.metrics: Dict[str, LaneMetrics] = {lane: LaneMetrics() for lane in LANES}
+        self._bulk_credit: float = 0
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def _admitted(self, lane: str, waited: float) -> None:
+        metrics = self.metrics[lane]
+        metrics.admitted += 1
+        metrics.total_wait += waited
+        metrics.max_wait = max(metrics.max_wait, waited)
+
+    async def admit(self, lane: str) -> None:
+        """
+        Wait for a share of the budget.
+        :param lane: Lane of the request.
+        """
+        now = time.monotonic()
+        if not any(self.queues.values()) and self.bucket.try_take(now):
+            return self._admitted(lane, 0)
+
+        future = asyncio.get_running_loop().create_future()
+        self.queues[lane].append((future, now))
+        self.metrics[lane].depth += 1
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+        await future
+
+    def _next_lane(self) -> Optional[str]:
+        busy = [lane for lane in LANES if self.queues[lane]]
+        if not busy:
+            return None
+        self._bulk_credit = min(1.0, self._bulk_credit + self.bulk_share)
+        if 'bulk' in busy and (self._bulk_credit >= 1 or len(busy) == 1):
+            self._bulk_credit = max(0.0, self._bulk_credit - 1)
+            return 'bulk'
+        return busy[0]
+
+    async def _dispatch(self) -> None:
+        while any(self.queues.values()):
+            delay = self.bucket.reserve(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+            while True:
+                lane = self._next_lane()
+                if lane is None:
+                    self.bucket.tokens += 1  # Every waiting request was cancelled, give the budget back
+                    break
+                future, queued = self.queues[lane].popleft()
+                self.metrics[lane].depth -= 1
+                if not future.done():
+                    future.set_result(None)
+                    self._admitted(lane, time.monotonic() - queued)
+                    break
+
+
+class RateLimiter:
+    """
+    Paces outbound Bot API messages: a global messages per second budget, a budget per chat and a per minute budget per
+    group. Flood limits are waited out by pausing only the chat Telegram complained about.
+    The global budget is shared by priority lanes (see `use_lane`): interactive requests go first, then notifications,
+    then bulk sends, which still get a reserved share of the budget.
+    Install it with `RateLimiter().install(bot)` or `Neko(..., rate_limiter=RateLimiter())`.
+    """
+    limited_methods: Tuple[str, ...] = ('send', 'edit', 'copy', 'forward')  # Method prefixes that produce messages
+
+    def __init__(
+            self,
+            global_rate: float = 30,
+            chat_rate: float = 1,
+            chat_burst: float = 3,
+            group_rate: float = 20,
+            max_retries: int = 3,
+            bulk_share: float = 0.2
+    ):
+        """
+        Initialize RateLimiter.
+        :param global_rate: Max messages per second for all chats.
+        :param chat_rate: Max messages per second in a single chat.
+        :param chat_burst: Number of messages a chat may receive at once before chat_rate applies.
+        :param group_rate: Max messages per minute in a single group or channel.
+        :param max_retries: Max number of times a request is retried after a flood limit error, requests with files
+        are not retried.
+        :param bulk_share: Share of the global budget reserved for bulk requests while other lanes are busy.
+        """
+        self.global_rate: float = global_rate
+        self.chat_rate: float = chat_rate
+        self.chat_burst: float = chat_burst
+        self.group_rate: float = group_rate
+        self.max_retries: int = max_retries
+        self.bulk_share: float = bulk_share
+        self._global: Dict[str, LaneScheduler] = dict()  # Bot tokens and their global budgets
+        self._chats: Dict[ChatKey, TokenBucket] = dict()
+        self._groups: Dict[ChatKey, TokenBucket] = dict()
+        self._paused: Dict[ChatKey, float] = dict()  # Chats and monotonic time they are paused until
+        self._last_sweep: float = time.monotonic()
+
+    def install(self, bot: Bot) -> None:
+        """
+        Route requests of a bot through the limiter.
+        :param bot: Aiogram Bot object.
+        """
+        if self.installed(bot) is not None:
+            raise RuntimeError('A rate limiter is already installed on this bot')
+
+        async def request(method: str, data: Optional[Dict[str, Any]] = None, files: Optional[Dict[str, Any]] = None,
+                          **kwargs) -> Any:
+            return await self.request(bot, request.wrapped, method, data, files, **kwargs)
+        request.rate_limiter = self
+        request.wrapped = bot.request
+        bot.request = request
+
+    @staticmethod
+    def installed(bot: Bot) -> Optional['RateLimiter']:
+        """
+        Find a limiter installed on a bot, other wrappers of `bot.request` may be installed around it.
+        :param bot: Aiogram Bot object.
+        :return: RateLimiter or None.
+        """
+        request = bot.request
+        while request is not None:
+            if getattr(request, 'rate_limiter', None) is not None:
+                return request.rate_limiter
+            request = getattr(request, 'wrapped', None)
+        return None
+
+    @staticmethod
+    def uninstall(bot: Bot) -> None:
+        """
+        Stop routing requests of a bot through a limiter.
+        :param bot: Aiogram Bot object.
+        """
+        outer, request = None, bot.request
+        while request is not None:
+            if getattr(request, 'rate_limiter', None) is not None:
+                if outer is None:
+                    bot.request = request.wrapped
+                else:  # Wrappers look the wrapped request up on every call
+                    outer.wrapped = request.wrapped
+                return
+            outer, request = request, getattr(request, 'wrapped', None)
+
+    def limited_chat(self, method: str, data: Optional[Dict[str, Any]]) -> Optional[Union[int, str]]:
+        """
+        Get a chat a request is limited in.
+        :param method: Bot API method.
+        :param data: Request parameters.
+        :return: Telegram chat ID or None if the request is not limited.
+        """
+        chat_id = data.get('chat_id') if data else None
+        if chat_id is None or not method.startswith(self.limited_methods):
+            return None
+        if isinstance(chat_id, str) and chat_id.lstrip('-').isdigit():
+            chat_id = int(chat_id)
+        return chat_id
+
+    @staticmethod
+    def _is_group(chat_id: Union[int, str]) -> bool:
+        return isinstance(chat_id, str) or chat_id < 0  # Usernames of channels or negative IDs
+
+    def _bucket(self, buckets: Dict[Any, TokenBucket], key: Any, rate: float, capacity: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate=rate, capacity=capacity)
+        return bucket
+
+    def _sweep(self, now: float) -> None:
+        """
+        Forget chats that are not limited anymore, so a broadcast does not leave a bucket per user behind.
+        """
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for buckets in (self._chats, self._groups):
+            for key in [key for key, bucket in buckets.items() if bucket.is_idle(now)]:
+                del buckets[key]
+        for key in [key for key, until in self._paused.items() if until <= now]:
+            del self._paused[key]
+
+    async def acquire(self, token: str, chat_id: Union[int, str]) -> None:
+        """
+        Wait until a message may be sent to a chat.
+        :param token: Bot token.
+        :param chat_id: Telegram chat ID.
+        """
+        now = time.monotonic()
+        self._sweep(now)
+        key: ChatKey = (token, chat_id)
+        # Messages held by a flood limit are spread out after the pause instead of being sent at once
+        delay = max(self._paused.get(key, now) - now, 0) + \
+            self._bucket(self._chats, key, self.chat_rate, self.chat_burst).reserve(now)
+        if self._is_group(chat_id):
+            delay = max(delay, self._bucket(self._groups, key, self.group_rate / 60, self.group_rate).reserve(now))
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        # The global budget is taken only once the chat may receive the message, so waiting chats do not hold it
+        scheduler = self._global.get(token)
+        if scheduler is None:
+            scheduler = self._global[token] = LaneScheduler(rate=self.global_rate, bulk_share=self.bulk_share)
+        await scheduler.admit(get_lane())
+
+    def lane_metrics(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get queue depth and wait times per lane, summed up for every bot.
+        :return: A dict of lanes and their depth, number of admitted requests, average and max wait in seconds.
+        """
+        metrics: Dict[str, LaneMetrics] = {lane: LaneMetrics() for lane in LANES}
+        for scheduler in self._global.values():
+            for lane, lane_metrics in scheduler.metrics.items():
+                total = metrics[lane]
+                total.depth += lane_metrics.depth
+                total.admitted += lane_metrics.admitted
+                total.total_wait += lane_metrics.total_wait
+                total.max_wait = max(total.max_wait, lane_metrics.max_wait)
+        return {lane: lane_metrics.to_dict() for lane, lane_metrics in metrics.items()}
+
+    def pause(self, token: str, chat_id: Union[int, str], seconds: float) -> None:
+        """
+        Hold messages to a chat.
+        :param token: Bot token.
+        :param chat_id: Telegram chat ID.
+        :param seconds: Seconds to hold messages for.
+        """
+        key: ChatKey = (token, chat_id)
+        self._paused[key] = max(self._paused.get(key, 0), time.monotonic() + seconds)
+
+    async def request(self, bot: Bot, send: Any, method: str, data: Optional[Dict[str, Any]] = None,
+                      files: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        """
+        Make a Bot API request respecting the limits.
+        :param bot: Aiogram Bot object.
+        :param send: Original request method of the bot.
+        :param method: Bot API method.
+        :param data: Request parameters.
+        :param files: Request files.
+        :return: Request result.
+        """
+        chat_id = self.limited_chat(method, data)
+        if chat_id is None:
+            return await send(method, data, files, **kwargs)
+
+        token: str = bot._ctx_token.get(bot._token)  # noqa
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(token, chat_id)
+            try:
+                return await send(method, data, files, **kwargs)
+            except aiogram_exc.RetryAfter as e:
+                LOGGER.warning(f'Flood limit hit in {chat_id} chat, pausing it for {e.timeout}s. *hisses*')
+                self.pause(token, chat_id, e.timeout)
+                if attempt == self.max_retries or files:  # Uploaded files are consumed by the first attempt
+                    raise
@@ -1,6 +1,12 @@
 from typing import Union, Optional, Dict, Any, AsyncGenerator, List, Tuple, Iterable
 from datetime import datetime, timedelta
 from abc import ABC, abstractmethod
+import time
+
+try:
+    import ujson as json
+except ImportError:
+    import json
 
 
 class BaseStorage(ABC):
@@ -112,6 +118,220 @@ class BaseStorage(ABC):
     async def close_pool(self) -> bool:
         pass
 
+    async def get_media_file_id(self, bot_id: int, media_key: str) -> Optional[str]:
+        """
+        Get a Telegram file ID of media uploaded by a bot.
+        :param bot_id: Telegram ID of the bot.
+        :param media_key: Key identifying media by its path and content.
+        :return: File ID if present, otherwise None.
+        """
+        row = await self.get(f'SELECT file_id FROM nekogram_media WHERE id = {self.p(1)}', (f'{bot_id}:{media_key}',))
+        return row.get('file_id') if row else None
+
+    async def set_media_file_id(self, bot_id: int, media_key: str, file_id: Optional[str] = None) -> None:
+        """
+        Set a Telegram file ID of media uploaded by a bot.
+        :param bot_id: Telegram ID of the bot.
+        :param media_key: Key identifying media by its path and content.
+        :param file_id: File ID, None to delete it.
+        """
+        key = f'{bot_id}:{media_key}'
+        if file_id is None:
+            await self.apply(f'DELETE FROM nekogram_media WHERE id = {self.p(1)}', (key,))
+        elif not await self.apply(
+                f'UPDATE nekogram_media SET file_id = {self.p(1)} WHERE id = {self.p(2)}', (file_id, key)
+        ):
+            await self.apply(
+                f'INSERT INTO nekogram_media (id, file_id) VALUES ({self.p(1)}, {self.p(2)})',
+                (key, file_id),
+                ignore_errors=True  # Another worker might have inserted it first
+            )
+
+    async def set_user_blocked(self, user_id: int, blocked: bool = True) -> None:
+        """
+        Mark a user who blocked the bot, so broadcasts skip them.
+        :param user_id: Telegram user ID.
+        :param blocked: False to unmark the user.
+        """
+        if not blocked:
+            await self.apply(f'DELETE FROM nekogram_blocked_users WHERE id = {self.p(1)}', (user_id,))
+        elif not await self.check(f'SELECT id FROM nekogram_blocked_users WHERE id = {self.p(1)}', (user_id,)):
+            await self.apply(
+                f'INSERT INTO nekogram_blocked_users (id) VALUES ({self.p(1)})', (user_id,), ignore_errors=True
+            )
+
+    async def check_user_blocked(self, user_id: int) -> Optional[bool]:
+        """
+        Check that a user exists and whether they blocked the bot in a single query.
+        :param user_id: Telegram user ID.
+        :return: None if the user does not exist, otherwise True if they are marked as blocked.
+        """
+        row = await self.get(
+            f'SELECT u.id AS id, b.id AS blocked_id FROM nekogram_users u '
+            f'LEFT JOIN nekogram_blocked_users b ON b.id = u.id WHERE u.id = {self.p(1)}', (user_id,)
+        )
+        if not row:
+            return None
+        return row.get('blocked_id') is not None
+
+    async def get_user_id_ranges(self, ranges: int) -> List[Tuple[int, int]]:
+        """
+        Split users into ranges of IDs holding equal numbers of users.
+        :param ranges: Max number of ranges.
+        :return: A list of inclusive ranges of user IDs.
+        """
+        row = await self.get('SELECT COUNT(*) AS users, MIN(id) AS first_id, MAX(id) AS last_id FROM nekogram_users')
+        users = int((row or dict()).get('users') or 0)
+        if not users:
+            return []
+        step = -(-users // max(ranges, 1))
+        starts: List[int] = [row['first_id']]
+        for offset in range(step, users, step):
+            boundary = await self.get(
+                f'SELECT id FROM nekogram_users ORDER BY id LIMIT 1 OFFSET {self.p(1)}', (offset,)
+            )
+            starts.append(boundary['id'])
+        return [(start, starts[i + 1] - 1 if i + 1 < len(starts) else row['last_id']) for i, start in enumerate(starts)]
+
+    async def create_broadcast(self, job_id: str, data: Dict[str, Any], ranges: List[Tuple[int, int]]) -> None:
+        """
+        Save a broadcast job.
+        :param job_id: Unique job ID generated by the caller.
+        :param data: JSON serializable job data.
+        :param ranges: Inclusive ranges of user IDs to split the job into.
+        """
+        await self.apply(
+            f'INSERT INTO nekogram_broadcasts (id, data, status) VALUES ({self.p(1)}, {self.p(2)}, {self.p(3)})',
+            (job_id, json.dumps(data), 'running')
+        )
+        for range_start, range_end in ranges:
+            await self.apply(
+                f'INSERT INTO nekogram_broadcast_ranges (job_id, range_start, range_end) '
+                f'VALUES ({self.p(1)}, {self.p(2)}, {self.p(3)})',
+                (job_id, range_start, range_end)
+            )
+
+    async def get_broadcast(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a broadcast job.
+        :param job_id: Job ID.
+        :return: A dict with id, data and status of the job or None if it does not exist.
+        """
+        row = await self.get(f'SELECT id, data, status FROM nekogram_broadcasts WHERE id = {self.p(1)}', (job_id,))
+        if not row:
+            return None
+        return {'id': row['id'], 'data': json.loads(row['data']), 'status': row['status']}
+
+    async def get_broadcasts(self, status: str = 'running') -> List[Dict[str, Any]]:
+        """
+        Get broadcast jobs with a certain status.
+        :param status: running, done or cancelled.
+        :return: A list of dicts with id, data and status of jobs.
+        """
+        rows = await self.get(
+            f'SELECT id, data, status FROM nekogram_broadcasts WHERE status = {self.p(1)}', (status,), fetch_all=True
+        )
+        return [{'id': row['id'], 'data': json.loads(row['data']), 'status': row['status']} for row in rows or []]
+
+    async def set_broadcast_status(self, job_id: str, status: str) -> None:
+        """
+        Set a status of a broadcast job.
+        :param job_id: Job ID.
+        :param status: running, done or cancelled.
+        """
+        await self.apply(
+            f'UPDATE nekogram_broadcasts SET status = {self.p(1)} WHERE id = {self.p(2)}', (status, job_id)
+        )
+
+    async def claim_broadcast_range(self, job_id: str, worker_id: str, lease: int = 300) -> Optional[Dict[str, Any]]:
+        """
+        Claim an unfinished range of a broadcast job, ranges of workers that did not report for a lease are reclaimed.
+        :param job_id: Job ID.
+        :param worker_id: Unique ID of the claiming worker.
+        :param lease: Seconds a claim is valid for without checkpoints.
+        :return: A dict with range_start, range_end and last_user_id of the claimed range or None if none is left.
+        """
+        now = int(time.time())
+        candidates = await self.get(
+            f'SELECT range_start FROM nekogram_broadcast_ranges WHERE job_id = {self.p(1)} AND done = 0 '
+            f'AND (claimed_by IS NULL OR claimed_at < {self.p(2)}) ORDER BY range_start',
+            (job_id, now - lease),
+            fetch_all=True
+        )
+        for candidate in candidates or []:
+            if await self.apply(  # Only one of the workers racing for the range updates it
+                f'UPDATE nekogram_broadcast_ranges SET claimed_by = {self.p(1)}, claimed_at = {self.p(2)} '
+                f'WHERE job_id = {self.p(3)} AND range_start = {self.p(4)} AND done = 0 '
+                f'AND (claimed_by IS NULL OR claimed_at < {self.p(5)})',
+                (worker_id, now, job_id, candidate['range_start'], now - lease)
+            ):
+                return await self.get(
+                    f'SELECT range_start, range_end, last_user_id FROM nekogram_broadcast_ranges '
+                    f'WHERE job_id = {self.p(1)} AND range_start = {self.p(2)}',
+                    (job_id, candidate['range_start'])
+                )
+        return None
+
+    async def checkpoint_broadcast_range(
+            self,
+            job_id: str,
+            range_start: int,
+            worker_id: str,
+            last_user_id: int,
+            successful: int = 0,
+            failed: int = 0,
+            blocked: int = 0,
+            done: bool = False
+    ) -> bool:
+        """
+        Record progress of a claimed range and renew the claim.
+        :param job_id: Job ID.
+        :param range_start: Start of the range.
+        :param worker_id: ID of the worker that claimed the range.
+        :param last_user_id: ID of the last processed user.
+        :param successful: Number of messages delivered since the previous checkpoint.
+        :param failed: Number of messages failed since the previous checkpoint.
+        :param blocked: Number of users who blocked the bot since the previous checkpoint.
+        :param done: Whether the range is finished.
+        :return: False if the range was reclaimed by another worker.
+        """
+        return bool(await self.apply(
+            f'UPDATE nekogram_broadcast_ranges SET last_user_id = {self.p(1)}, successful = successful + {self.p(2)}, '
+            f'failed = failed + {self.p(3)}, blocked = blocked + {self.p(4)}, done = {self.p(5)}, '
+            f'claimed_at = {self.p(6)} '
+            f'WHERE job_id = {self.p(7)} AND range_start = {self.p(8)} AND claimed_by = {self.p(9)}',
+            (last_user_id, successful, failed, blocked, int(done), int(time.time()), job_id, range_start, worker_id)
+        ))
+
+    async def get_broadcast_stats(self, job_id: str) -> Dict[str, int]:
+        """
+        Sum up counters of a broadcast job.
+        :param job_id: Job ID.
+        :return: A dict of successful, failed, blocked, number of finished ranges (done) and number of ranges.
+        """
+        row = await self.get(
+            f'SELECT SUM(successful) AS successful, SUM(failed) AS failed, SUM(blocked) AS blocked, '
+            f'SUM(done) AS done, COUNT(*) AS ranges FROM nekogram_broadcast_ranges WHERE job_id = {self.p(1)}',
+            (job_id,)
+        )
+        return {key: int((row or dict()).get(key) or 0) for key in ('successful', 'failed', 'blocked', 'done', 'ranges')}
+
+    async def get_broadcast_recipients(self, after: int, until: int, limit: int = 500) -> List[int]:
+        """
+        Get IDs of users who did not block the bot in order.
+        :param after: Exclusive lower bound of user IDs.
+        :param until: Inclusive upper bound of user IDs.
+        :param limit: Max number of IDs.
+        :return: A list of user IDs.
+        """
+        rows = await self.get(
+            f'SELECT id FROM nekogram_users WHERE id > {self.p(1)} AND id <= {self.p(2)} '
+            f'AND id NOT IN (SELECT id FROM nekogram_blocked_users) ORDER BY id LIMIT {self.p(3)}',
+            (after, until, limit),
+            fetch_all=True
+        )
+        return [row['id'] for row in rows or []]
+
     async def add_tables(self, structure: Dict[str, Dict[str, Dict[str, Optional[str]]]], required_by: str):
         pass
 
@@ -119,6 +119,10 @@ class MySQLStorage(BaseStorage):
         )
         LOGGER.info('Verifying table structures, hold tight..')
         await self.verify_table(table='nekogram_users', required_by='NekoGram')
+        await self.verify_table(table='nekogram_media', required_by='NekoGram')
+        await self.verify_table(table='nekogram_blocked_users', required_by='NekoGram')
+        await self.verify_table(table='nekogram_broadcasts', required_by='NekoGram')
+        await self.verify_table(table='nekogram_broadcast_ranges', required_by='NekoGram')
         LOGGER.info('MySQLStorage initialized successfully. ~nya')
         return True
 
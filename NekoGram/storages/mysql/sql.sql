@@ -9,3 +9,43 @@ CREATE TABLE `nekogram_users` (
 
 ALTER TABLE `nekogram_users`
   ADD PRIMARY KEY (`id`);
+
+CREATE TABLE `nekogram_media` (
+  `id` varchar(100) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `file_id` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+ALTER TABLE `nekogram_media`
+  ADD PRIMARY KEY (`id`);
+
+CREATE TABLE `nekogram_blocked_users` (
+  `id` bigint(20) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+ALTER TABLE `nekogram_blocked_users`
+  ADD PRIMARY KEY (`id`);
+
+CREATE TABLE `nekogram_broadcasts` (
+  `id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `data` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL DEFAULT '{}',
+  `status` varchar(16) COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT 'running'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+ALTER TABLE `nekogram_broadcasts`
+  ADD PRIMARY KEY (`id`);
+
+CREATE TABLE `nekogram_broadcast_ranges` (
+  `job_id` varchar(36) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `range_start` bigint(20) NOT NULL,
+  `range_end` bigint(20) NOT NULL,
+  `last_user_id` bigint(20) DEFAULT NULL,
+  `claimed_by` varchar(64) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `claimed_at` bigint(20) NOT NULL DEFAULT 0,
+  `done` tinyint(1) NOT NULL DEFAULT 0,
+  `successful` int(11) NOT NULL DEFAULT 0,
+  `failed` int(11) NOT NULL DEFAULT 0,
+  `blocked` int(11) NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+ALTER TABLE `nekogram_broadcast_ranges`
+  ADD PRIMARY KEY (`job_id`, `range_start`);
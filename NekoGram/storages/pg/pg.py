@@ -35,7 +35,6 @@ class PGStorage(BaseStorage):
 
         super().__init__(default_language=default_language)
 
-    @property
     def p(self, counter: Optional[int] = None) -> str:
         if not counter:
             raise ValueError(f'`{self.__class__.__name__}.placeholder(counter={counter})`')
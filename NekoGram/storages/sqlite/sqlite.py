@@ -24,7 +24,6 @@ class SQLiteStorage(BaseStorage):
 
         super().__init__(default_language=default_language)
 
-    @property
     def p(self, counter: Optional[int] = None) -> str:
         return '?'
 
@@ -40,7 +39,7 @@ class SQLiteStorage(BaseStorage):
             LOGGER.exception('SQLite pool creation failed. *neko things')
             return False
         with open(os.path.abspath(__file__).replace('sqlite.py', 'tables.sql'), 'r', encoding='utf-8') as file:
-            await self.pool.execute(file.read())
+            await self.pool.executescript(file.read())
             await self.pool.commit()
         LOGGER.info('SQLite pool created successfully. *neko things')
         return True
@@ -5,4 +5,33 @@ CREATE TABLE IF NOT EXISTS "nekogram_users" (
     "last_message_id" INT DEFAULT NULL,
     "data" VARCHAR NOT NULL DEFAULT '{}',
     "lang" VARCHAR(2) NOT NULL DEFAULT 'en'
+);
+
+CREATE TABLE IF NOT EXISTS "nekogram_media" (
+    "id" VARCHAR(100) PRIMARY KEY,
+    "file_id" VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS "nekogram_blocked_users" (
+    "id" INTEGER PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS "nekogram_broadcasts" (
+    "id" VARCHAR(36) PRIMARY KEY,
+    "data" TEXT NOT NULL DEFAULT '{}',
+    "status" VARCHAR(16) NOT NULL DEFAULT 'running'
+);
+
+CREATE TABLE IF NOT EXISTS "nekogram_broadcast_ranges" (
+    "job_id" VARCHAR(36) NOT NULL,
+    "range_start" INTEGER NOT NULL,
+    "range_end" INTEGER NOT NULL,
+    "last_user_id" INTEGER DEFAULT NULL,
+    "claimed_by" VARCHAR(64) DEFAULT NULL,
+    "claimed_at" INTEGER NOT NULL DEFAULT 0,
+    "done" INTEGER NOT NULL DEFAULT 0,
+    "successful" INT NOT NULL DEFAULT 0,
+    "failed" INT NOT NULL DEFAULT 0,
+    "blocked" INT NOT NULL DEFAULT 0,
+    PRIMARY KEY ("job_id", "range_start")
 );
\ No newline at end of file
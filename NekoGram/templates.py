@@ -0,0 +1,148 @@
+from typing import Optional, Union, Dict, List, Any, Set, Callable
+from functools import lru_cache
+from string import Formatter
+import _string  # noqa
+
+
+class TemplateError(KeyError, IndexError, ValueError):
+    """
+    Raised when a template can not be formatted with the provided fields.
+    Inherits every exception `str.format` used to raise so existing handlers keep working.
+    """
+
+    def __str__(self) -> str:
+        return self.args[0]
+
+
+class Template:
+    """
+    A text or button template analyzed once: templates without placeholders are returned as is,
+    templates with placeholders are formatted with a bound formatter and validated on failure.
+    """
+    __slots__ = ('source', 'static', 'fields', 'positional', 'malformed', '_format', '_format_map')
+
+    def __init__(self, source: str):
+        self.source: str = source
+        self.static: Optional[str] = None  # Rendered text for templates without placeholders
+        self.fields: Set[str] = set()
+        self.positional: int = 0  # Number of positional fields required
+        self.malformed: Optional[str] = None
+        self._format: Callable[..., str] = source.format
+        self._format_map: Callable[[Dict[str, Any]], str] = source.format_map
+
+        try:
+            literals: List[str] = list()
+            has_fields: bool = False
+            auto_index: int = 0
+            for literal, field, spec, _ in Formatter().parse(source):
+                literals.append(literal)
+                if field is None:
+                    continue
+                has_fields = True
+                for name in [field] + [f for _, f, _, _ in Formatter().parse(spec or '') if f is not None]:
+                    first = _string.formatter_field_name_split(name)[0] if name else ''
+                    if first == '':  # Automatic field numbering
+                        first = auto_index
+                        auto_index += 1
+                    if isinstance(first, int):
+                        self.positional = max(self.positional, first + 1)
+                    else:
+                        self.fields.add(first)
+            if not has_fields:
+                self.static = ''.join(literals)
+        except ValueError as e:
+            self.malformed = str(e)
+
+    def format(self, formatting: Union[List[Any], Dict[str, Any], Any]) -> str:
+        """
+        Format the template.
+        :param formatting: A list, dict or single value to use for formatting.
+        :return: Formatted text.
+        """
+        if self.static is not None:
+            return self.static
+        try:
+            if isinstance(formatting, list):
+                return self._format(*formatting)
+            elif isinstance(formatting, dict):
+                if self.positional:
+                    return self._format(**formatting)
+                return self._format_map(formatting)
+            return self._format(formatting)
+        except (KeyError, IndexError, ValueError) as e:
+            raise self._explain(formatting) from e
+
+    def _explain(self, formatting: Union[List[Any], Dict[str, Any], Any]) -> TemplateError:
+        """
+        Build a descriptive error for a failed formatting attempt.
+        :param formatting: Formatting that failed to apply.
+        :return: TemplateError object.
+        """
+        if self.malformed:
+            return TemplateError(f'Template {self.source!r} is malformed: {self.malformed}. *tilts head*')
+
+        if isinstance(formatting, dict):
+            given_fields, given_positional = set(formatting.keys()), 0
+        elif isinstance(formatting, list):
+            given_fields, given_positional = set(), len(formatting)
+        else:
+            given_fields, given_positional = set(), 1
+
+        problems: List[str] = list()
+        missing = sorted(self.fields - given_fields)
+        if missing:
+            problems.append(f'missing fields: {", ".join(missing)}')
+        if self.positional > given_positional:
+            problems.append(f'{self.positional} positional values required, {given_positional} given')
+        if not problems:
+            problems.append('provided values do not match the placeholders')
+        return TemplateError(
+            f'Can not format template {self.source!r}, {"; ".join(problems)}. '
+            f'Provided: {sorted(map(str, given_fields)) or given_positional}. *confused meow*'
+        )
+
+
+@lru_cache(maxsize=2048)
+def _compile_dynamic(source: str) -> Template:
+    return Template(source)
+
+
+def get_template(source: str, templates: Optional[Dict[str, Template]] = None) -> Template:
+    """
+    Get an analyzed template for a string.
+    :param source: Template string.
+    :param templates: Templates compiled in advance, strings not found there are compiled and cached.
+    :return: Template object.
+    """
+    template = templates.get(source) if templates else None
+    if template is None:
+        template = _compile_dynamic(source)
+    return template
+
+
+def compile_templates(texts: Dict[str, Dict[str, Any]]) -> Dict[str, Template]:
+    """
+    Analyze every menu text and button template of a language in advance.
+    :param texts: Menus of a language.
+    :return: Template strings and their Template objects.
+    """
+    compiled: Dict[str, Template] = dict()
+
+    def add(value: Any) -> None:
+        if isinstance(value, str) and value not in compiled:
+            compiled[value] = Template(value)
+
+    for menu in texts.values():
+        if not isinstance(menu, dict):
+            continue
+        add(menu.get('text'))
+        add(menu.get('caption'))
+        markup = menu.get('markup')
+        if not isinstance(markup, list):
+            continue
+        for row in markup:
+            for button in row if isinstance(row, list) else ():
+                if isinstance(button, dict):
+                    for value in button.values():
+                        add(value)
+    return compiled
@@ -0,0 +1,31 @@
+from argparse import ArgumentParser
+import logging
+
+from .base_processor import BaseProcessor
+from .json_processor import JSONProcessor
+
+
+def build_bundle() -> None:
+    """
+    Prebuild a text bundle at deploy time:
+    `python -m NekoGram.text_processors translations widgets/translations -o texts.bundle -f yaml`
+    """
+    parser = ArgumentParser(prog='python -m NekoGram.text_processors', description='Build a NekoGram text bundle.')
+    parser.add_argument('paths', nargs='+', help='Translation files or directories.')
+    parser.add_argument('-o', '--output', required=True, help='Path to the bundle, same as `bundle_path`.')
+    parser.add_argument('-f', '--format', choices=('json', 'yaml'), default='json', help='Translation file format.')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    processor_class = JSONProcessor
+    if args.format == 'yaml':
+        from .yaml_processor import YAMLProcessor
+        processor_class = YAMLProcessor
+    processor: BaseProcessor = processor_class(validate_start=False, bundle_path=args.output)
+    for path in args.paths:
+        processor.add_texts(path)
+    print(f'{len(processor.sources)} translation files bundled to {args.output}')
+
+
+if __name__ == '__main__':
+    build_bundle()
@@ -1,17 +1,159 @@
-from typing import Union, Dict, Any, TextIO
+from typing import Union, Optional, Dict, List, Any, TextIO, Iterator, Tuple, Set, FrozenSet
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections.abc import Mapping
+from types import MappingProxyType
+from contextlib import suppress
 from abc import ABC, abstractmethod
+import asyncio
+import hashlib
+import pickle
+import time
 import os
 import io
 
+from ..templates import Template, compile_templates, get_template
+from .bundle import TextBundle
+from ..logger import LOGGER
+
+
+def _read_file(
+        processor: 'BaseProcessor',
+        path: str,
+        detect: bool,
+        known_digest: Optional[str],
+        with_digest: bool
+) -> Tuple[Optional[str], Optional[Dict[str, Any]], int, int, Optional[str]]:
+    """
+    Read a translation file, runs in worker threads or processes.
+    :param processor: Text processor to parse the file with.
+    :param path: Path to the file.
+    :param detect: Whether to only find the language of the file if it can be done without parsing.
+    :param known_digest: Content hash of the file stored in a bundle.
+    :param with_digest: Whether to calculate a content hash.
+    :return: Language (None if the content hash matches the known one), parsed texts, mtime, size and content hash.
+    """
+    stat = os.stat(path)
+    with open(path, 'rb') as file:
+        raw = file.read()
+    digest = hashlib.blake2b(raw, digest_size=16).hexdigest() if with_digest else None
+    if digest is not None and digest == known_digest:
+        return None, None, stat.st_mtime_ns, stat.st_size, digest
+    texts = raw.decode('utf-8')
+    data: Optional[Dict[str, Any]] = None
+    lang = processor.detect_lang(texts) if detect else None
+    if lang is None:
+        data = processor._parse(texts)  # noqa
+        lang = data['lang']
+    return lang, data, stat.st_mtime_ns, stat.st_size, digest
+
+
+def _read_file_safe(*args: Any) -> Union[tuple, Exception]:
+    try:
+        return _read_file(*args)
+    except Exception as e:
+        return e
+
+
+class TextSource:
+    """
+    A translation file or string texts were loaded from.
+    """
+    __slots__ = ('key', 'path', 'lang', 'is_widget', 'data', 'mtime', 'size', 'digest', 'shared')
+
+    def __init__(
+            self,
+            key: str,
+            path: Optional[str],
+            lang: str,
+            is_widget: bool = False,
+            data: Optional[Dict[str, Any]] = None,
+            mtime: int = 0,
+            size: int = 0,
+            digest: Optional[str] = None
+    ):
+        self.key: str = key
+        self.path: Optional[str] = path  # None for texts that were not loaded from a file
+        self.lang: str = lang
+        self.is_widget: bool = is_widget
+        self.data: Optional[Dict[str, Any]] = data  # Parsed texts, None until parsed or after unloading
+        self.mtime: int = mtime  # Nanoseconds
+        self.size: int = size
+        self.digest: Optional[str] = digest  # Content hash, only calculated when a bundle is used
+        self.shared: bool = False  # Whether data was deduplicated against other sources
+
+
+class Translations(Mapping):
+    """
+    Read-only mapping of languages to their texts, languages are parsed on first access in lazy mode.
+    Identical values are shared between menus and languages, so texts must never be modified in place.
+    """
+
+    def __init__(self, processor: 'BaseProcessor'):
+        self._processor: BaseProcessor = processor
+
+    def __getitem__(self, lang: str) -> Dict[str, Any]:
+        return self._processor.get_language(lang)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._processor.index.keys())
+
+    def __len__(self) -> int:
+        return len(self._processor.index)
+
+    def __contains__(self, lang: object) -> bool:
+        return lang in self._processor.index
+
+    def __repr__(self) -> str:
+        return f'<Translations {list(self)}>'
+
 
 class BaseProcessor(ABC):
-    def __init__(self, validate_start: bool = True):
+    def __init__(
+            self,
+            validate_start: bool = True,
+            lazy: bool = False,
+            unload_after: Optional[float] = None,
+            bundle_path: Optional[str] = None,
+            workers: Optional[int] = None,
+            use_processes: bool = False
+    ):
         """
         Initialize BaseProcessor.
         :param validate_start: Whether to check `start` object exists for each language.
+        :param lazy: Whether to only index translation files on startup and parse each language on first use.
+        :param unload_after: Number of seconds after which unused languages are unloaded (lazy mode only).
+        :param bundle_path: A path to keep compiled translation files at, so unchanged files are not parsed again.
+        :param workers: Max number of files read at once, 1 reads files sequentially.
+        :param use_processes: Whether to parse files in a process pool, useful for formats parsed in pure Python.
         """
-        self.texts: Dict[str, Dict[str, Any]] = dict()
         self._validate_start: bool = validate_start
+        self.lazy: bool = lazy
+        if unload_after is not None and not lazy:
+            LOGGER.warning('unload_after has no effect without lazy mode, ignored. *tilts head*')
+            unload_after = None
+        self.unload_after: Optional[float] = unload_after
+        self.version: int = 0  # Incremented every time texts change, used to invalidate derived caches
+        self.sources: Dict[str, TextSource] = dict()
+        self.index: Dict[str, List[TextSource]] = dict()  # Sources of each language in loading order
+        self._languages: Dict[str, Dict[str, Any]] = dict()  # Parsed languages
+        self._templates: Dict[str, Dict[str, Template]] = dict()  # Templates of parsed languages
+        self._last_used: Dict[str, float] = dict()
+        self._last_sweep: float = time.monotonic()
+        self._string_sources: int = 0
+        self.texts: Translations = Translations(self)
+        self.bundle: Optional[TextBundle] = TextBundle(bundle_path, type(self).__name__) if bundle_path else None
+        self._bundle_outdated: bool = False
+        self._directories: Dict[str, bool] = dict()  # Added directories and whether they contain widget texts
+        self._broken: Dict[str, int] = dict()  # Files that failed to reload and their mtimes
+        self._watcher: Optional[asyncio.Task] = None
+        self._conflicts: Set[Tuple[str, str, str, str]] = set()  # Reported duplicate menus
+        self._pool: Dict[Any, Any] = dict()  # Canonical strings and structures shared between languages
+        self._menu_names: Tuple[Optional[Tuple[int, int]], FrozenSet[str]] = (None, frozenset())
+        self.workers: Optional[int] = workers
+        self.use_processes: bool = use_processes
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'_validate_start': self._validate_start}  # Worker processes only parse files
 
     @property
     @abstractmethod
@@ -29,6 +171,289 @@ class BaseProcessor(ABC):
         :return: `dict` texts.
         """
 
+    def detect_lang(self, texts: str) -> Optional[str]:
+        """
+        Find the language of `str` texts without parsing them, used to index files in lazy mode.
+        :param texts: `str` texts.
+        :return: Language if it can be found cheaply, otherwise None (texts are parsed then).
+        """
+        return None
+
+    def _parse(self, texts: str) -> Dict[str, Any]:
+        data = self.from_str(texts)
+        if not isinstance(data, dict) or data.get('lang') is None:
+            raise ValueError('Some texts do not contain a language definition field "lang".')
+        return data
+
+    def _read_source(self, source: TextSource) -> Dict[str, Any]:
+        """
+        Parse texts of a source if they are not parsed yet.
+        :param source: TextSource object.
+        :return: Parsed texts.
+        """
+        if source.data is None:
+            entry = self.bundle.get(source.path) if self.bundle else None
+            if entry is not None and entry.digest == source.digest:
+                source.data = self.bundle.read(source.path)
+                return source.data
+            with open(source.path, 'r', encoding='utf-8') as file:
+                data = self._parse(file.read())
+            if data['lang'] != source.lang:
+                raise ValueError(f'Language of {source.path} changed from {source.lang} to {data["lang"]}.')
+            source.data = data
+        return source.data
+
+    def _read_files(self, paths: List[str], known_digests: Dict[str, str],
+                    detect: Optional[bool] = None) -> List[Union[tuple, Exception]]:
+        """
+        Read files concurrently in a thread or process pool.
+        :param paths: File paths.
+        :param known_digests: Content hashes of files stored in the bundle, such files are not parsed if unchanged.
+        :param detect: Whether to only find languages of files if possible, defaults to lazy mode.
+        :return: Results of `_read_file` or exceptions in order of paths.
+        """
+        detect = self.lazy if detect is None else detect
+        args = [(self, path, detect, known_digests.get(path), self.bundle is not None) for path in paths]
+        if len(paths) < 2 or self.workers == 1:
+            return [_read_file_safe(*a) for a in args]
+        pool_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with pool_class(max_workers=self.workers) as pool:
+            return list(pool.map(_read_file_safe, *zip(*args), chunksize=8 if self.use_processes else 1))
+
+    def _load_files(self, paths: List[str]) -> Dict[str, TextSource]:
+        """
+        Read translation files, taking unchanged files from the bundle.
+        :param paths: Absolute file paths.
+        :return: A dict of paths and unregistered sources.
+        """
+        sources: Dict[str, TextSource] = dict()
+        pending: List[str] = list()
+        for path in paths:
+            entry = self.bundle.get(path) if self.bundle else None
+            if entry is not None:
+                stat = os.stat(path)
+                if entry.matches(mtime=stat.st_mtime_ns, size=stat.st_size):
+                    sources[path] = TextSource(
+                        key=path, path=path, lang=entry.lang, mtime=entry.mtime, size=entry.size, digest=entry.digest
+                    )
+                    continue
+            pending.append(path)
+
+        if pending and self.bundle:
+            self._bundle_outdated = True  # Either files changed or only their mtimes did
+        known_digests: Dict[str, str] = dict()
+        for path in pending if self.bundle else ():
+            entry = self.bundle.get(path)
+            if entry is not None:
+                known_digests[path] = entry.digest
+        for path, result in zip(pending, self._read_files(pending, known_digests)):
+            if isinstance(result, Exception):
+                raise result
+            lang, data, mtime, size, digest = result
+            if lang is None:  # Unchanged, taken from the bundle
+                lang = self.bundle.get(path).lang
+            sources[path] = TextSource(
+                key=path, path=path, lang=lang, data=data, mtime=mtime, size=size, digest=digest
+            )
+        return sources
+
+    def _add_source(self, source: TextSource, is_widget: bool) -> Optional[TextSource]:
+        """
+        Register a source in the index.
+        :param source: TextSource object.
+        :param is_widget: True if texts is a widget texts, otherwise False.
+        :return: TextSource object or None if texts were ignored.
+        """
+        if is_widget and source.lang not in self.index:
+            return None  # ignore extra langs for widgets
+        source.is_widget = is_widget
+        previous = self.sources.get(source.key)
+        if previous is not None:
+            self.index[previous.lang].remove(previous)
+        self.sources[source.key] = source
+        self.index.setdefault(source.lang, list()).append(source)
+        return source
+
+    def _add_str(self, texts: str, is_widget: bool) -> Optional[TextSource]:
+        data = self._parse(texts)
+        self._string_sources += 1
+        return self._add_source(
+            TextSource(key=f'<texts {self._string_sources}>', path=None, lang=data['lang'], data=data), is_widget
+        )
+
+    def _merge_language(self, lang: str, sources: List[TextSource]) -> Dict[str, Any]:
+        """
+        Parse and merge sources of a language.
+        :param lang: Language.
+        :param sources: Sources of the language in loading order.
+        :return: Texts of the language.
+        """
+        texts: Dict[str, Any] = dict()
+        owners: Dict[str, str] = dict()  # Files menus were taken from
+        for source in sources:
+            data = self._deduplicate(source)
+            if source.path is not None:  # Texts added as strings are meant to override files
+                for key in data.keys() & owners.keys():
+                    if key != 'lang' and (lang, key, owners[key], source.key) not in self._conflicts:
+                        self._conflicts.add((lang, key, owners[key], source.key))
+                        LOGGER.warning(
+                            f'{key} ({lang}) is defined in both {owners[key]} and {source.key}, '
+                            f'the latter is used. *ears twitching*'
+                        )
+                owners.update(dict.fromkeys(data.keys(), source.key))
+            texts.update(data)
+        if texts.get('start') is None and self._validate_start:
+            raise RuntimeError(f'"start" menu is undefined for {lang}! *Nervous paw shaking*')
+        return texts
+
+    def _share(self, value: Any) -> Any:
+        """
+        Get a canonical instance of a value, equal strings, lists and dicts are stored once.
+        A value not in the pool becomes canonical itself once its items are replaced with canonical ones.
+        :param value: A value of parsed texts.
+        :return: The canonical value.
+        """
+        if isinstance(value, str):
+            return self._pool.setdefault(value, value)
+        elif isinstance(value, dict):
+            items = [(self._share(k), self._share(v)) for k, v in value.items()]
+            key = (dict, *(i for k, v in items for i in (k, self._pool_key(v))))
+        elif isinstance(value, list):
+            items = [self._share(v) for v in value]
+            key = (list, *(self._pool_key(v) for v in items))
+        else:
+            return value
+        shared = self._pool.get(key)
+        if shared is None:  # Equal items are replaced in place, so languages holding the value keep sharing it
+            if isinstance(value, dict):
+                if any(a is not k or value[a] is not v for a, (k, v) in zip(value, items)):
+                    value.clear()
+                    value.update(items)
+            elif any(a is not v for a, v in zip(value, items)):
+                value[:] = items
+            shared = self._pool[key] = value
+        return shared
+
+    @staticmethod
+    def _pool_key(value: Any) -> Any:
+        if isinstance(value, str):
+            return value
+        elif isinstance(value, (dict, list)):
+            return id(value)  # Canonical values are kept alive by the pool, so their ids are stable
+        return type(value), value
+
+    def _deduplicate(self, source: TextSource) -> Dict[str, Any]:
+        """
+        Parse texts of a source and replace their values with canonical ones.
+        :param source: TextSource object.
+        :return: Parsed texts.
+        """
+        data = self._read_source(source)
+        if not source.shared:
+            data = source.data = {self._share(k): self._share(v) for k, v in data.items()}
+            source.shared = True
+        return data
+
+    def _rebuild_pool(self) -> None:
+        """
+        Drop canonical values that are no longer used by parsed sources.
+        """
+        self._pool = dict()
+        for source in self.sources.values():
+            if source.shared and source.data is not None:
+                for key, value in list(source.data.items()):
+                    self._share(key)
+                    source.data[key] = self._share(value)
+        for texts in self._languages.values():  # Loaded languages hold values of sources, equal ones are unified
+            for key, value in list(texts.items()):
+                texts[key] = self._share(value)
+
+    def _load_language(self, lang: str) -> Dict[str, Any]:
+        """
+        Parse and merge all sources of a language.
+        :param lang: Language to load.
+        :return: Texts of the language.
+        """
+        texts = self._merge_language(lang, self.index[lang])
+        self._languages[lang], self._templates[lang] = texts, compile_templates(texts)
+        if self.lazy:
+            LOGGER.info(f'Texts for {lang} loaded')
+        return texts
+
+    @property
+    def loaded_languages(self) -> Mapping[str, Dict[str, Any]]:
+        """
+        Languages that are parsed already and their texts, unlike `texts` this never parses languages.
+        :return: A read-only mapping of languages to their texts.
+        """
+        return MappingProxyType(self._languages)
+
+    @property
+    def menu_names(self) -> Optional[FrozenSet[str]]:
+        """
+        Names of menus defined in any language.
+        :return: A set of menu names or None if some languages are not loaded yet in lazy mode.
+        """
+        if len(self._languages) < len(self.index):
+            return None
+        key = (self.version, len(self._languages))
+        if self._menu_names[0] != key:
+            self._menu_names = (key, frozenset(name for texts in self._languages.values() for name in texts.keys()))
+        return self._menu_names[1]
+
+    def get_language(self, lang: str) -> Dict[str, Any]:
+        """
+        Get texts of a language, parsing them if required.
+        :param lang: Language.
+        :return: Texts of the language.
+        """
+        texts = self._languages.get(lang)
+        if texts is None:
+            if lang not in self.index:
+                raise KeyError(lang)
+            texts = self._load_language(lang)
+        if self.unload_after is not None:
+            now = time.monotonic()
+            self._last_used[lang] = now
+            if now - self._last_sweep >= self.unload_after:
+                self._last_sweep = now
+                unloaded: bool = False
+                for used_lang, last_used in list(self._last_used.items()):
+                    if now - last_used >= self.unload_after:
+                        unloaded = self._unload_language(used_lang) or unloaded
+                if unloaded:
+                    self._rebuild_pool()
+        return texts
+
+    def get_template(self, source: str, lang: Optional[str] = None) -> Template:
+        """
+        Get an analyzed template of a string, templates of loaded languages are compiled in advance.
+        :param source: Template string.
+        :param lang: Language the string belongs to.
+        :return: Template object.
+        """
+        return get_template(source, self._templates.get(lang))
+
+    def _unload_language(self, lang: str) -> bool:
+        self._last_used.pop(lang, None)
+        self._templates.pop(lang, None)
+        if self._languages.pop(lang, None) is None:
+            return False
+        for source in self.index.get(lang, ()):
+            if source.path is not None:
+                source.data = None
+                source.shared = False
+        LOGGER.info(f'Texts for {lang} unloaded')
+        return True
+
+    def unload_language(self, lang: str) -> None:
+        """
+        Drop parsed texts of a language, they are parsed again on next use.
+        :param lang: Language to unload.
+        """
+        if self._unload_language(lang):
+            self._rebuild_pool()
+
     def add_texts(self, texts: Union[str, TextIO] = 'translations', is_widget: bool = False) -> None:
         """
         Assigns a required piece of texts to use later.
@@ -37,27 +462,203 @@ class BaseProcessor(ABC):
         :param is_widget: True if texts is a widget texts, otherwise False.
         :return: None.
         """
+        items: List[Tuple[Optional[str], Optional[str], bool]] = list()  # File paths or str texts in order
+
         def gather(_texts: Union[str, TextIO] = 'translations', _is_widget: bool = False) -> None:
             if isinstance(_texts, io.TextIOWrapper):  # opened file
-                gather(_texts.read(), _is_widget)
+                items.append((None, _texts.read(), _is_widget))
             elif os.path.isdir(_texts):  # path to the dir
+                self._directories.setdefault(os.path.abspath(_texts), _is_widget)
                 for entry in os.listdir(_texts):
                     gather(os.path.abspath(os.path.join(_texts, entry)), _is_widget)
             elif os.path.isfile(_texts):  # path to the file
                 if any(_texts.endswith(ext) for ext in self.extensions):  # supported
-                    with open(_texts, 'r', encoding='utf-8') as file:
-                        gather(file, _is_widget)
+                    items.append((os.path.abspath(_texts), None, _is_widget))
             elif isinstance(_texts, str):  # str
-                _texts = self.from_str(_texts)
-                lang = _texts.get('lang')
-                if lang is None:
-                    raise ValueError('Some texts do not contain a language definition field "lang".')
-                if _is_widget and lang not in self.texts.keys():  # ignore extra langs for widgets
-                    return
-                self.texts[lang] = self.texts.get(lang, dict()) | _texts
+                items.append((None, _texts, _is_widget))
             else:
                 raise NotImplementedError(f"Can't parse `texts` of type {type(_texts)} and value {_texts}.")
         gather(texts, is_widget)
-        for lang, data in self.texts.items():
-            if data.get('start') is None and self._validate_start:
-                raise RuntimeError(f'"start" menu is undefined for {lang}! *Nervous paw shaking*')
+
+        files = self._load_files([path for path, _, _ in items if path is not None])
+        added: List[TextSource] = list()
+        for path, _texts, _is_widget in items:
+            source = self._add_str(_texts, _is_widget) if path is None else self._add_source(files[path], _is_widget)
+            if source:
+                added.append(source)
+        self.version += 1
+        for lang in dict.fromkeys(source.lang for source in added):
+            if not self.lazy or lang in self._languages:
+                self._load_language(lang)
+        if self._bundle_outdated:
+            self.save_bundle()
+
+    def save_bundle(self) -> None:
+        """
+        Write every translation file to the bundle, files that are not registered but still exist are kept.
+        """
+        files: Dict[str, tuple] = dict()
+        for path, entry in self.bundle.entries.items():
+            if path not in self.sources and os.path.isfile(path):
+                files[path] = (entry.mtime, entry.size, entry.digest, entry.lang, self.bundle.blob(path))
+        for source in self.sources.values():
+            if source.path is None:
+                continue
+            entry = self.bundle.get(source.path)
+            if source.data is None and entry is not None and entry.digest == source.digest:
+                blob = self.bundle.blob(source.path)
+            else:
+                loaded = source.data is not None
+                blob = pickle.dumps(self._read_source(source), protocol=pickle.HIGHEST_PROTOCOL)
+                if not loaded and source.lang not in self._languages:
+                    source.data = None  # Keep unused languages unloaded in lazy mode
+            files[source.path] = (source.mtime, source.size, source.digest, source.lang, blob)
+        self.bundle.save(files)
+        self._bundle_outdated = False
+        LOGGER.info(f'Text bundle {self.bundle.path} saved with {len(files)} files')
+
+    def _find_changes(self) -> Tuple[Dict[str, bool], List[str]]:
+        """
+        Find changed, new and removed translation files by their mtimes (blocking).
+        :return: Changed or new file paths with their widget flags, removed file paths.
+        """
+        changed: Dict[str, bool] = dict()
+        removed: List[str] = list()
+        for source in list(self.sources.values()):
+            if source.path is None:
+                continue
+            try:
+                stat = os.stat(source.path)
+            except FileNotFoundError:
+                removed.append(source.path)
+                continue
+            if (stat.st_mtime_ns != source.mtime or stat.st_size != source.size) \
+                    and self._broken.get(source.path) != stat.st_mtime_ns:
+                changed[source.path] = source.is_widget
+        for directory, is_widget in list(self._directories.items()):
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    path = os.path.abspath(os.path.join(root, name))
+                    if path in self.sources or path in changed or not any(path.endswith(e) for e in self.extensions):
+                        continue
+                    with suppress(FileNotFoundError):
+                        if self._broken.get(path) != os.stat(path).st_mtime_ns:
+                            changed[path] = is_widget
+        return changed, removed
+
+    def _reload_files(self, paths: Dict[str, bool]) -> List[TextSource]:
+        """
+        Read and parse changed translation files (blocking), files that fail to parse are skipped.
+        :param paths: File paths with their widget flags.
+        :return: A list of parsed sources.
+        """
+        sources: List[TextSource] = list()
+        # Always parsed here, so languages are not parsed on the event loop when the reload is applied
+        for (path, is_widget), result in zip(paths.items(), self._read_files(list(paths.keys()), dict(), detect=False)):
+            if isinstance(result, FileNotFoundError):
+                continue
+            elif isinstance(result, Exception):
+                with suppress(OSError):
+                    self._broken[path] = os.stat(path).st_mtime_ns
+                LOGGER.warning(f'Failed to reload {path}, previous texts are kept: {result} *hisses*')
+                continue
+            self._broken.pop(path, None)
+            lang, data, mtime, size, digest = result
+            sources.append(TextSource(
+                key=path, path=path, lang=lang, is_widget=is_widget, data=data, mtime=mtime, size=size, digest=digest
+            ))
+        return sources
+
+    def _apply_reload(self, sources: List[TextSource], removed: List[str]) -> List[str]:
+        """
+        Swap in reloaded sources and rebuild affected languages, nothing changes if a language fails to build.
+        :param sources: Parsed changed or new sources.
+        :param removed: Paths of removed files.
+        :return: A list of affected languages.
+        """
+        registry: Dict[str, TextSource] = dict(self.sources)
+        index: Dict[str, List[TextSource]] = {lang: list(items) for lang, items in self.index.items()}
+        affected: Dict[str, None] = dict()
+
+        for path in removed:
+            old = registry.pop(path)
+            index[old.lang].remove(old)
+            affected[old.lang] = None
+        for source in sources:
+            old = registry.get(source.path)
+            if old is None and source.is_widget and source.lang not in index:
+                continue  # ignore extra langs for widgets
+            if old is not None and old.lang == source.lang:
+                index[old.lang][index[old.lang].index(old)] = source  # Keep the merging order
+            else:
+                if old is not None:
+                    index[old.lang].remove(old)
+                    affected[old.lang] = None
+                index.setdefault(source.lang, list()).append(source)
+            registry[source.path] = source
+            affected[source.lang] = None
+
+        languages: Dict[str, Dict[str, Any]] = dict(self._languages)
+        templates: Dict[str, Dict[str, Template]] = dict(self._templates)
+        for lang in affected:
+            templates.pop(lang, None)  # Stale templates are dropped
+            if not index.get(lang):
+                index.pop(lang, None)
+                languages.pop(lang, None)
+            elif lang in languages or not self.lazy:
+                languages[lang] = self._merge_language(lang, index[lang])
+                templates[lang] = compile_templates(languages[lang])
+
+        self.sources, self.index, self._languages, self._templates = registry, index, languages, templates
+        self._rebuild_pool()
+        self.version += 1
+        self._bundle_outdated = self.bundle is not None
+        return list(affected)
+
+    async def reload(self) -> int:
+        """
+        Re-parse changed translation files in a thread pool and atomically swap in updated languages.
+        :return: Number of changed, new and removed files.
+        """
+        loop = asyncio.get_running_loop()
+        changed, removed = await loop.run_in_executor(None, self._find_changes)
+        if not changed and not removed:
+            return 0
+        sources = await loop.run_in_executor(None, self._reload_files, changed)
+        if not sources and not removed:
+            return 0
+        try:
+            affected = self._apply_reload(sources, removed)
+        except Exception as e:
+            for source in sources:
+                self._broken[source.path] = source.mtime
+            LOGGER.warning(f'Failed to reload texts, previous texts are kept: {e} *hisses*')
+            return 0
+        if self._bundle_outdated:
+            self.save_bundle()
+        LOGGER.info(f'Texts reloaded for {", ".join(affected)}')
+        return len(sources) + len(removed)
+
+    async def _watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                LOGGER.exception(f'Failed to check texts for changes: {e}')
+
+    def watch(self, interval: float = 2.0) -> asyncio.Task:
+        """
+        Start reloading changed translation files in background, has to be called within a running event loop,
+        e.g. in `on_startup`.
+        :param interval: Number of seconds between checks.
+        :return: Watcher task.
+        """
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.get_running_loop().create_task(self._watch(interval))
+        return self._watcher
+
+    def stop_watching(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
@@ -0,0 +1,121 @@
+from typing import Optional, Dict, Any, Tuple
+import pickle
+import struct
+import mmap
+import os
+
+from ..logger import LOGGER
+
+
+class BundleEntry:
+    """
+    A translation file stored in a bundle.
+    """
+    __slots__ = ('mtime', 'size', 'digest', 'lang', 'offset', 'length')
+
+    def __init__(self, mtime: int, size: int, digest: str, lang: str, offset: int, length: int):
+        self.mtime: int = mtime  # Nanoseconds
+        self.size: int = size
+        self.digest: str = digest
+        self.lang: str = lang
+        self.offset: int = offset
+        self.length: int = length
+
+    def matches(self, mtime: int, size: int) -> bool:
+        return self.mtime == mtime and self.size == size
+
+
+class TextBundle:
+    """
+    Compiled translation files: an index of source files followed by a pickled blob of parsed texts per file.
+    The bundle is memory-mapped and each file is unpickled only when its texts are needed.
+    """
+    _magic: bytes = b'NEKOTXT1'
+    _header: struct.Struct = struct.Struct('>8sQ')  # Magic, index length
+
+    def __init__(self, path: str, processor: str):
+        """
+        Initialize TextBundle.
+        :param path: Path to the bundle file.
+        :param processor: Name of the text processor class that parsed the texts.
+        """
+        self.path: str = path
+        self.processor: str = processor
+        self.entries: Dict[str, BundleEntry] = dict()
+        self._buffer: Optional[mmap.mmap] = None
+        self._data_start: int = 0  # Blob offsets are relative to the end of the index
+        self.load()
+
+    def load(self) -> bool:
+        """
+        Read the bundle index, an outdated or broken bundle is ignored.
+        :return: True if the bundle was loaded, otherwise False.
+        """
+        self.close()
+        if not os.path.isfile(self.path) or os.path.getsize(self.path) < self._header.size:
+            return False
+        try:
+            with open(self.path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, index_length = self._header.unpack_from(buffer, 0)
+            if magic != self._magic:
+                raise ValueError('not a NekoGram text bundle')
+            processor, entries = pickle.loads(buffer[self._header.size:self._header.size + index_length])
+        except Exception as e:
+            LOGGER.warning(f'Text bundle {self.path} is unreadable and will be rebuilt: {e} *sniffs suspiciously*')
+            return False
+        if processor != self.processor:
+            buffer.close()
+            return False
+        self._buffer = buffer
+        self._data_start = self._header.size + index_length
+        self.entries = {path: BundleEntry(*entry) for path, entry in entries.items()}
+        return True
+
+    def get(self, path: str) -> Optional[BundleEntry]:
+        return self.entries.get(path)
+
+    def blob(self, path: str) -> bytes:
+        """
+        Get pickled texts of a file.
+        :param path: Path to the source file.
+        :return: Pickled texts.
+        """
+        entry = self.entries[path]
+        start = self._data_start + entry.offset
+        return self._buffer[start:start + entry.length]
+
+    def read(self, path: str) -> Dict[str, Any]:
+        """
+        Unpickle texts of a file.
+        :param path: Path to the source file.
+        :return: Parsed texts.
+        """
+        return pickle.loads(self.blob(path))
+
+    def save(self, files: Dict[str, Tuple[int, int, str, str, bytes]]) -> None:
+        """
+        Write the bundle atomically and map the new file.
+        :param files: A dict of source file paths and their mtimes, sizes, digests, languages and pickled texts.
+        """
+        entries: Dict[str, Tuple[int, int, str, str, int, int]] = dict()
+        offset = 0
+        for path, (mtime, size, digest, lang, blob) in files.items():
+            entries[path] = (mtime, size, digest, lang, offset, len(blob))
+            offset += len(blob)
+        index = pickle.dumps((self.processor, entries), protocol=pickle.HIGHEST_PROTOCOL)
+
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self._header.pack(self._magic, len(index)))
+            f.write(index)
+            for _, _, _, _, blob in files.values():
+                f.write(blob)
+        os.replace(tmp_path, self.path)  # Mappings of the old file stay valid until they are closed
+        self.load()
+
+    def close(self) -> None:
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+        self.entries = dict()
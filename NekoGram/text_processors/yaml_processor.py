@@ -1,4 +1,5 @@
-from typing import Any
+from typing import Optional, Any
+import re
 
 try:
     import yaml
@@ -7,14 +8,36 @@ except ImportError:
 
 from .base_processor import BaseProcessor
 
+_LANG_PATTERN = re.compile(r'^lang\s*:\s*[\'"]?([\w-]+)[\'"]?\s*(?:#.*)?$', re.MULTILINE)  # Top-level `lang` key
+
 
 class YAMLProcessor(BaseProcessor):
-    def __init__(self, validate_start: bool = True):
+    def __init__(
+            self,
+            validate_start: bool = True,
+            lazy: bool = False,
+            unload_after: Optional[float] = None,
+            bundle_path: Optional[str] = None,
+            workers: Optional[int] = None,
+            use_processes: bool = False
+    ):
         """
         Initialize YAMLProcessor.
         :param validate_start: Whether to check `start` object exists for each language.
+        :param lazy: Whether to only index translation files on startup and parse each language on first use.
+        :param unload_after: Number of seconds after which unused languages are unloaded (lazy mode only).
+        :param bundle_path: A path to keep compiled translation files at, so unchanged files are not parsed again.
+        :param workers: Max number of files read at once, 1 reads files sequentially.
+        :param use_processes: Whether to parse files in a process pool, useful for formats parsed in pure Python.
         """
-        super().__init__(validate_start=validate_start)
+        super().__init__(
+            validate_start=validate_start,
+            lazy=lazy,
+            unload_after=unload_after,
+            bundle_path=bundle_path,
+            workers=workers,
+            use_processes=use_processes
+        )
 
     @property
     def extensions(self) -> list[str]:
@@ -22,3 +45,7 @@ class YAMLProcessor(BaseProcessor):
 
     def from_str(self, texts: str) -> dict[str, Any]:
         return yaml.safe_load(texts)
+
+    def detect_lang(self, texts: str) -> Optional[str]:
+        match = _LANG_PATTERN.search(texts)
+        return match.group(1) if match else None
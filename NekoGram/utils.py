@@ -1,8 +1,9 @@
 from aiogram.dispatcher.middlewares import BaseMiddleware
 from contextlib import suppress
-from aiogram import types
-from typing import Union
+from aiogram import Bot, types
+from typing import Union, Any, List, Awaitable
 from io import BytesIO
+import asyncio
 import aiohttp
 
 try:
@@ -64,6 +65,42 @@ class HandlerInjector(BaseMiddleware):
             query.conf['request_token'] = query.conf['parent']().conf['request_token']
 
 
+def copy_tree(value: Any) -> Any:
+    """
+    Copy parsed texts, unlike `deepcopy` shared values become independent copies.
+    :param value: A dict, list or scalar value.
+    :return: Copied value.
+    """
+    if isinstance(value, dict):
+        return {k: copy_tree(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [copy_tree(v) for v in value]
+    return value
+
+
+def get_bot_id(bot: Bot) -> int:
+    """
+    Get an ID of the bot whose token is currently in use (respects `Bot.with_token`).
+    :param bot: Aiogram Bot object.
+    :return: Telegram ID of the bot.
+    """
+    return int(bot._ctx_token.get(bot._token).split(':')[0])  # noqa
+
+
+async def gather_ordered(*aws: Awaitable[Any]) -> List[Any]:
+    """
+    Run awaitables concurrently and wait for all of them, unlike `asyncio.gather` the exception raised does not depend
+    on which awaitable failed first: it is the exception of the first failed awaitable in argument order.
+    :param aws: Awaitables to run.
+    :return: Results in argument order.
+    """
+    results = await asyncio.gather(*aws, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
 async def telegraph_upload(f: Union[BytesIO, types.Message], mime: str = 'image/png') -> Union[str, bool]:
     """
     Upload a file to https://telegra.ph.
@@ -1,7 +1,85 @@
 from aiogram.dispatcher.webhook import WebhookRequestHandler, web
 from aiogram.utils.executor import Executor
+from aiogram import Dispatcher, Bot, types
+from typing import Optional, List, Tuple, Dict, Any
+import asyncio
 
+from .webhook_reply import WebhookReply
 from .base_neko import BaseNeko
+from .logger import LOGGER
+
+
+class UpdateQueue:
+    """
+    Processes webhook updates in the background, so Telegram gets a response as soon as an update is parsed.
+    Updates that do not fit into the queue are refused with 429 and redelivered by Telegram later.
+    """
+
+    def __init__(self, workers: int = 16, max_size: int = 1000, retry_after: int = 1, drain_timeout: float = 30):
+        """
+        Initialize UpdateQueue.
+        :param workers: Number of updates to process concurrently.
+        :param max_size: Max number of updates waiting to be processed.
+        :param retry_after: Seconds Telegram is asked to wait for when the queue is full.
+        :param drain_timeout: Max seconds to process the queued updates for on shutdown.
+        """
+        self.workers: int = workers
+        self.max_size: int = max_size
+        self.retry_after: int = retry_after
+        self.drain_timeout: float = drain_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = list()
+
+    def put(self, dispatcher: Dispatcher, update: types.Update, token: str, bot: Optional[Bot] = None) -> bool:
+        """
+        Queue an update for processing.
+        :param dispatcher: Dispatcher to process the update with.
+        :param update: Aiogram Update object.
+        :param token: Token of the bot the update was sent to.
+        :param bot: Bot object of the bot the update was sent to, the dispatcher bot by default.
+        :return: False if the queue is full.
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._workers = [asyncio.get_running_loop().create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            self._queue.put_nowait((dispatcher, update, token, bot or dispatcher.bot))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _worker(self) -> None:
+        while True:
+            item: Tuple[Dispatcher, types.Update, str, Bot] = await self._queue.get()
+            dispatcher, update, token, bot = item
+            try:
+                Bot.set_current(bot)
+                Dispatcher.set_current(dispatcher)
+                with dispatcher.bot.with_token(token):
+                    await dispatcher.updates_handler.notify(update)
+            except Exception as e:  # noqa
+                LOGGER.exception(f'Failed to process update {update.update_id}: {e} *hisses*')
+            finally:
+                self._queue.task_done()
+
+    async def close(self, *_) -> None:
+        """
+        Process the queued updates and stop the workers.
+        """
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            LOGGER.warning(f'{len(self)} updates were left unprocessed on shutdown. *tired meow*')
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._queue = None
+        self._workers = list()
 
 
 class KittyExecutor(Executor):
@@ -13,6 +91,22 @@ class KittyExecutor(Executor):
 
 
 class KittyWebhook(WebhookRequestHandler):
+    @staticmethod
+    async def _send_held(neko: BaseNeko, token: str, held: Optional[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Send a call held for a webhook response that can not be returned in the response.
+        :param neko: Neko object.
+        :param token: Token of the bot the update was sent to.
+        :param held: The held method and its data or None.
+        """
+        if held is None:
+            return
+        try:
+            with neko.bot.with_token(token, validate_token=False):
+                await neko.bot.request(*held)
+        except Exception as e:  # noqa
+            LOGGER.warning(f'{held[0]} held for a webhook response failed: {e} *confused meow*')
+
     async def post(self):
         self.validate_ip()
         neko: BaseNeko = self.request.app['APP_EXECUTOR'].neko
@@ -21,13 +115,33 @@ class KittyWebhook(WebhookRequestHandler):
         update = await self.parse_update(dispatcher.bot)
         update.conf['neko'] = neko
         update.conf['request_token'] = self.request.match_info['token']
+        bot: Bot = neko.bot_pool.get(update.conf['request_token']) if hasattr(neko, 'bot_pool') else neko.bot
+
+        update_queue: Optional[UpdateQueue] = getattr(neko, 'update_queue', None)
+        if update_queue is not None:
+            if not update_queue.put(dispatcher, update=update, token=update.conf['request_token'], bot=bot):
+                return web.Response(status=429, text='queue is full',
+                                    headers={'Retry-After': str(update_queue.retry_after)})
+            return web.Response(text='ok')
 
-        with neko.bot.with_token(update.conf['request_token']):
-            results = await self.process_update(update)
-        response = self.get_response(results)
+        reply = WebhookReply(token=update.conf['request_token'])
+        response, held = None, None
+        try:
+            with neko.bot.with_token(update.conf['request_token'], validate_token=False), reply.bind():
+                Bot.set_current(bot)  # Objects of the update send requests with the child bot
+                results = await self.process_update(update)
+            response = self.get_response(results)
+            held = reply.close()
+        finally:
+            if not reply.closed:  # Processing failed, the held call is not lost with the error response
+                await self._send_held(neko, update.conf['request_token'], reply.close())
 
         if response:
+            if held is not None:  # Only one call fits into the response
+                await self._send_held(neko, update.conf['request_token'], held)
             web_response = response.get_web_response()
+        elif held is not None:
+            web_response = web.json_response({'method': held[0], **held[1]})
         else:
             web_response = web.Response(text='ok')
 
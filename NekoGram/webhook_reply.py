@@ -0,0 +1,108 @@
+from typing import Optional, Dict, Tuple, Any, Iterator, Callable, Awaitable
+from contextlib import contextmanager
+from contextvars import ContextVar
+from aiogram import Bot
+
+from .ratelimit import RateLimiter
+from .logger import LOGGER
+
+_webhook_reply: ContextVar[Optional['WebhookReply']] = ContextVar('nekogram_webhook_reply', default=None)
+_reply_allowed: ContextVar[bool] = ContextVar('nekogram_reply_allowed', default=False)
+
+
+@contextmanager
+def reply_in_webhook(allowed: bool = True) -> Iterator[None]:
+    """
+    Let the first request of an update made inside the block be sent in the webhook response, e.g.
+    `with reply_in_webhook(): await menu.send_message()`. Only use it where neither the result nor errors of
+    the request are needed, the request returns a placeholder result instead.
+    :param allowed: False to forbid it inside a block that allows it.
+    """
+    token = _reply_allowed.set(allowed)
+    try:
+        yield
+    finally:
+        _reply_allowed.reset(token)
+
+
+class WebhookReply:
+    """
+    Telegram accepts one Bot API call in a webhook response, which saves an outbound request.
+    The first eligible request of an update is held back and returned in the response, a request made after it
+    sends it right away, so the order of requests is kept.
+    """
+    methods: Dict[str, Any] = {
+        'sendMessage': dict(),
+        'editMessageText': True,
+        'answerCallbackQuery': True
+    }  # Eligible methods and results returned in place of the real ones
+
+    def __init__(self, token: str):
+        """
+        Initialize WebhookReply.
+        :param token: Token of the bot the update was sent to.
+        """
+        self.token: str = token
+        self.call: Optional[Tuple[str, Dict[str, Any]]] = None
+        self.pristine: bool = True  # No request was made for the update yet
+        self.closed: bool = False
+
+    @classmethod
+    def install(cls, bot: Bot) -> None:
+        """
+        Route requests of a bot through webhook replies of the updates they are made for.
+        :param bot: Aiogram Bot object.
+        """
+        if getattr(bot.request, 'webhook_reply', False):
+            return
+
+        async def request(method: str, data: Optional[Dict[str, Any]] = None, files: Optional[Dict[str, Any]] = None,
+                          **kwargs) -> Any:
+            reply = _webhook_reply.get()
+            if reply is None or reply.closed:
+                return await request.wrapped(method, data, files, **kwargs)
+            return await reply.request(bot, request.wrapped, method, data, files, **kwargs)
+        request.webhook_reply = True
+        request.wrapped = bot.request
+        bot.request = request
+
+    @contextmanager
+    def bind(self) -> Iterator['WebhookReply']:
+        """
+        Collect the reply for requests made inside the block, tasks created inside the block inherit it.
+        """
+        token = _webhook_reply.set(self)
+        try:
+            yield self
+        finally:
+            _webhook_reply.reset(token)
+
+    async def request(self, bot: Bot, send: Callable[..., Awaitable[Any]], method: str, data: Optional[Dict[str, Any]],
+                      files: Optional[Dict[str, Any]], **kwargs) -> Any:
+        pristine, self.pristine = self.pristine, False
+        if pristine and method in self.methods and not files and _reply_allowed.get() \
+                and bot._ctx_token.get(bot._token) == self.token:  # noqa
+            limiter = RateLimiter.installed(bot)
+            chat_id = limiter.limited_chat(method, data) if limiter is not None else None
+            if chat_id is not None:  # The held message counts towards limits like any other one
+                await limiter.acquire(bot._ctx_token.get(bot._token), chat_id)  # noqa
+            self.call = (method, dict(data or dict()))
+            return self.methods[method]
+
+        if self.call is not None:  # Keep the order of requests
+            held_method, held_data = self.call
+            self.call = None
+            try:
+                await send(held_method, held_data)
+            except Exception as e:  # noqa
+                LOGGER.warning(f'{held_method} held for a webhook response failed: {e} *confused meow*')
+        return await send(method, data, files, **kwargs)
+
+    def close(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Stop holding requests back.
+        :return: The held method and its data or None.
+        """
+        self.closed = True
+        call, self.call = self.call, None
+        return call
@@ -1,10 +1,9 @@
 from aiogram import exceptions as aiogram_exc, types
 from typing import Union, Dict, List, Any
 from asyncio import sleep
-from io import BytesIO
 
 from NekoGram import Neko, Menu, NekoRouter
-from NekoGram.utils import telegraph_upload
+from NekoGram.broadcast import BroadcastJob
 from . import utils
 
 ROUTER: NekoRouter = NekoRouter(name='broadcast')
@@ -25,12 +24,11 @@ async def widget_broadcast(_: Menu, message: Union[types.Message, types.Callback
     user_data = await neko.storage.get_user_data(user_id=message.from_user.id)
     user_data.pop('menu')
     user_data['widget_broadcast_post_caption'] = message.html_text if message.text or message.caption else None
-    if message.content_type != 'text':  # Upload non-text posts to Telegraph
+    if message.content_type != 'text':  # Telegram file IDs are reused, the media is not uploaded again
         if message.photo:
-            f = await (max(message.photo, key=lambda c: c.width)).download(destination=BytesIO())
+            user_data['widget_broadcast']['file_id'] = max(message.photo, key=lambda c: c.width).file_id
         else:
-            f = await getattr(message, message.content_type).download(destination=BytesIO())
-        user_data['widget_broadcast']['file_id'] = await telegraph_upload(f)
+            user_data['widget_broadcast']['file_id'] = getattr(message, message.content_type).file_id
     user_data['widget_broadcast_content_type'] = message.content_type
 
     await neko.storage.set_user_data(data=user_data, user_id=message.from_user.id, replace=True)
@@ -44,7 +42,7 @@ async def widget_broadcast_post_preview(_: Menu, call: Union[types.Message, type
 
     await call.message.delete()
 
-    await utils.send_post(user_data=user_data, chat_id=call.from_user.id, neko=neko)
+    await utils.send_post(post=utils.prepare_post(user_data), chat_id=call.from_user.id, neko=neko)
 
     data = await neko.build_menu(name='widget_broadcast_post', obj=call)
     await data.send_message()
@@ -93,35 +91,20 @@ async def widget_broadcast_add_button_step_2(_: Menu, message: Union[types.Messa
 async def widget_broadcast_broadcast(data: Menu, call: Union[types.Message, types.CallbackQuery], neko: Neko):
     user_data = await neko.storage.get_user_data(user_id=call.from_user.id)
 
-    total: int = await neko.storage.check('SELECT id FROM nekogram_users;')
-    attempts: int = 0
-    successful: int = 0
-    failed: int = 0
+    payload = {'widget': 'broadcast', 'post': utils.prepare_post(user_data)}  # Lets the widget resume the job
+    job = await BroadcastJob.create(neko=neko, payload=payload, exclude=[call.from_user.id])  # Except the sender
+    await call.message.edit_text(text=data.text.format(total=job.data['total'], attempts=0, successful=0, failed=0))
 
-    await call.message.edit_text(text=data.text.format(total=total, attempts=0, successful=0, failed=0))
+    async def report(stats: Dict[str, int]):
+        await __safe_exec(call.message.edit_text, text=data.text.format(**stats))
 
-    async for user in neko.storage.select('SELECT * FROM nekogram_users;'):
-        if user['id'] == call.from_user.id:
-            continue
-
-        attempts += 1
-        if await __safe_exec(utils.send_post, user_data=user_data, chat_id=user['id'], neko=neko):
-            successful += 1
-        else:
-            failed += 1
-        await sleep(.2)
-
-        if attempts % 5 == 0:
-            await __safe_exec(call.message.edit_text, text=data.text.format(
-                total=total, attempts=attempts, successful=successful, failed=failed
-            ))
+    stats = await job.run(send=lambda chat_id: utils.send_post(post=payload['post'], chat_id=chat_id, neko=neko),
+                          progress=report)
 
     for key in user_data.copy().keys():
         if key.startswith('widget_broadcast'):
             user_data.pop(key)
     user_data.pop('menu')
     await neko.storage.set_user_data(data=user_data, user_id=call.from_user.id, replace=True)
-    await data.build(text_format={
-        'total': total, 'attempts': attempts, 'successful': successful, 'failed': failed
-    }, allowed_buttons=[2])
+    await data.build(text_format=stats, allowed_buttons=[2])
     await __safe_exec(data.edit_message())
@@ -1,5 +1,21 @@
+import asyncio
+
+from ...broadcast import BroadcastJob
 from ...base_neko import BaseNeko
+from ...logger import LOGGER
+from . import utils
+
+
+async def _resume(job: BroadcastJob, neko: BaseNeko):
+    post = job.payload.get('post') or utils.prepare_post(job.payload)  # Jobs of older versions kept user data
+    stats = await job.run(send=lambda chat_id: utils.send_post(post=post, chat_id=chat_id, neko=neko))
+    LOGGER.info(f'Resumed broadcast {job.id} finished: {stats}')
 
 
-async def startup(_: BaseNeko):
-    pass
+async def startup(neko: BaseNeko):
+    """
+    Resume broadcasts interrupted by a restart, ranges claimed by running processes are left to them.
+    """
+    for job in await BroadcastJob.running(neko):
+        if job.payload.get('widget') == 'broadcast':
+            asyncio.get_running_loop().create_task(_resume(job, neko))
@@ -1,8 +1,16 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from typing import List, Dict
+from typing import Optional, List, Dict, Tuple, Any
+from aiogram.utils.payload import prepare_arg
 
 from ...base_neko import BaseNeko
 
+SEND_METHODS: Dict[str, Tuple[str, Optional[str]]] = {
+    'text': ('sendMessage', None),
+    'photo': ('sendPhoto', 'photo'),
+    'video': ('sendVideo', 'video'),
+    'animation': ('sendAnimation', 'animation')
+}  # Content types and their send methods with file fields
+
 
 def assemble_markup(markup: List[List[Dict[str, str]]]) -> InlineKeyboardMarkup:
     final_markup = InlineKeyboardMarkup()
@@ -15,41 +23,32 @@ def assemble_markup(markup: List[List[Dict[str, str]]]) -> InlineKeyboardMarkup:
     return final_markup
 
 
-async def send_post(user_data: dict, chat_id: int, neko: BaseNeko):
-    post_data = user_data['widget_broadcast']
-    post_data['content_type'] = user_data['widget_broadcast_content_type']
-    post_data['caption'] = user_data.get('widget_broadcast_post_caption')
-    raw_markup = user_data.get('widget_broadcast_post_markup', [])
-
-    if post_data['content_type'] == 'text':
-        await neko.bot.send_message(
-            text=post_data['caption'],
-            parse_mode='HTML',
-            disable_web_page_preview=True,
-            reply_markup=assemble_markup(raw_markup),
-            chat_id=chat_id
-        )
-    elif post_data['content_type'] == 'photo':
-        await neko.bot.send_photo(
-            photo=post_data['file_id'],
-            parse_mode='HTML',
-            caption=post_data['caption'],
-            reply_markup=assemble_markup(raw_markup),
-            chat_id=chat_id
-        )
-    elif post_data['content_type'] == 'video':
-        await neko.bot.send_video(
-            video=post_data['file_id'],
-            parse_mode='HTML',
-            caption=post_data['caption'],
-            reply_markup=assemble_markup(raw_markup),
-            chat_id=chat_id
-        )
+def prepare_post(user_data: dict) -> Dict[str, Any]:
+    """
+    Prepare a post once per broadcast: pick the send method and serialize its parameters.
+    :param user_data: User data with the post collected by the widget.
+    :return: A dict of Bot API method and its parameters except chat_id.
+    """
+    method, file_field = SEND_METHODS.get(user_data['widget_broadcast_content_type'], SEND_METHODS['animation'])
+    params: Dict[str, Any] = {
+        'parse_mode': 'HTML',
+        'reply_markup': prepare_arg(assemble_markup(user_data.get('widget_broadcast_post_markup', [])))
+    }
+    caption: Optional[str] = user_data.get('widget_broadcast_post_caption')
+    if file_field is None:
+        params.update(text=caption, disable_web_page_preview=True)
     else:
-        await neko.bot.send_animation(
-            animation=post_data['file_id'],
-            parse_mode='HTML',
-            caption=post_data['caption'],
-            reply_markup=assemble_markup(raw_markup),
-            chat_id=chat_id
-        )
+        params[file_field] = user_data['widget_broadcast']['file_id']
+        if caption is not None:
+            params['caption'] = caption
+    return {'method': method, 'params': params}
+
+
+async def send_post(post: Dict[str, Any], chat_id: int, neko: BaseNeko) -> Dict[str, Any]:
+    """
+    Send a prepared post with a single API call.
+    :param post: A post returned by `prepare_post`.
+    :param chat_id: Telegram chat ID.
+    :param neko: Neko to send the post with.
+    """
+    return await neko.bot.request(post['method'], {**post['params'], 'chat_id': chat_id})
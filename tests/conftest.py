@@ -0,0 +1,72 @@
+from typing import Dict, Any
+
+import pytest
+
+from NekoGram import Neko
+from NekoGram.storages import BaseStorage
+from NekoGram.text_processors import JSONProcessor
+
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+TOKEN = '123456:ABCdefGHIjklMNOpqrSTUvwxYZ012345678'
+
+
+class MemoryStorage(BaseStorage):
+    def __init__(self):
+        super().__init__()
+        self.last_message_ids = dict()
+
+    def p(self, counter=None):
+        return '?'
+
+    async def set_user_language(self, user_id, language):
+        pass
+
+    async def get_user_language(self, user_id):
+        return 'en'
+
+    async def set_user_data(self, user_id, data=None, replace=False, bot_token=None):
+        return dict()
+
+    async def get_user_data(self, user_id, bot_token=None):
+        return dict()
+
+    async def check_user_exists(self, user_id):
+        return True
+
+    async def set_last_message_id(self, user_id, message_id):
+        self.last_message_ids[user_id] = message_id
+
+    async def get_last_message_id(self, user_id):
+        return self.last_message_ids.get(user_id)
+
+    async def create_user(self, *args, **kwargs):
+        pass
+
+    async def apply(self, *args, **kwargs):
+        return 0
+
+    async def get(self, *args, **kwargs):
+        return dict()
+
+    async def check(self, *args, **kwargs):
+        return 0
+
+    async def acquire_pool(self):
+        return True
+
+    async def close_pool(self):
+        return True
+
+
+@pytest.fixture
+def make_neko():
+    def make(texts: Dict[str, Any]) -> Neko:
+        processor = JSONProcessor()
+        neko = Neko(storage=MemoryStorage(), token=TOKEN, text_processor=processor, load_texts=False)
+        processor.add_texts(json.dumps({'lang': 'en', **texts}))
+        return neko
+    return make
@@ -0,0 +1,30 @@
+import asyncio
+
+from NekoGram.broadcast import Broadcast
+
+
+def test_progress_ends_with_final_stats(make_neko):
+    neko = make_neko({'start': {'text': 'Meow'}})
+    reports = []
+
+    async def send(user_id):
+        pass
+
+    async def progress(stats):
+        reports.append(stats.to_dict())
+
+    broadcast = Broadcast(neko, send, workers=2, rate=10 ** 6, progress=progress, progress_interval=60)
+    asyncio.run(broadcast.run(range(5), total=5))
+    assert len(reports) == 1 and reports[0]['successful'] == 5
+
+
+def test_recipients_are_counted_in_sql(make_neko):
+    neko = make_neko({'start': {'text': 'Meow'}})
+    queries = []
+
+    async def get(query, args=(), fetch_all=False):
+        queries.append(query)
+        return {'users': 3}
+    neko.storage.get = get
+    assert asyncio.run(Broadcast.count_recipients(neko.storage)) == 3
+    assert queries[0].startswith('SELECT COUNT(*)')
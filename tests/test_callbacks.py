@@ -0,0 +1,51 @@
+import pytest
+
+from NekoGram.callbacks import CallbackCodec
+from NekoGram.text_processors import JSONProcessor
+
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+
+def test_scan_does_not_load_every_language():
+    processor = JSONProcessor(lazy=True)
+    processor.add_texts(json.dumps({'lang': 'en', 'start': {'text': 'Hi'}, 'menu_a': {'text': 'A'}}))
+    processor.add_texts(json.dumps({'lang': 'ru', 'start': {'text': 'Hi'}, 'menu_a': {'text': 'A'}}))
+    codec = CallbackCodec(processor, prefixes=['menu_'])
+    data = codec.encode('menu_a#15')
+
+    assert CallbackCodec(processor, prefixes=['menu_']).decode(data) == ('menu_a', 15)
+    assert len(processor.loaded_languages) == 1
+
+
+
+def _colliding_names(id_length):
+    seen = {}
+    for i in range(1000):
+        name = f'menu_{i}'
+        menu_id = CallbackCodec(JSONProcessor(), prefixes=['menu_'], id_length=id_length).menu_id(name)
+        if menu_id in seen:
+            return seen[menu_id], name, menu_id
+        seen[menu_id] = name
+
+
+def test_colliding_ids_do_not_depend_on_order():
+    first, second, menu_id = _colliding_names(id_length=1)
+    for names in ((first, second), (second, first)):
+        codec = CallbackCodec(JSONProcessor(), prefixes=['menu_'], id_length=1)
+        assert codec.encode(f'{names[0]}#1') == f'~{menu_id}.1'
+        assert codec.encode(f'{names[1]}#1') == f'{names[1]}#1'  # Not compacted
+        assert codec.encode(f'{names[0]}#1') == f'{names[0]}#1'  # Neither menu keeps the id
+        assert codec.decode(f'~{menu_id}.1') == (None, 1)
+
+
+def test_colliding_ids_are_reported_on_startup():
+    first, second, _ = _colliding_names(id_length=1)
+    processor = JSONProcessor()
+    texts = {'lang': 'en', 'start': {'text': 'Hi'}, second: {'text': 'B'}, first: {'text': 'A'}}
+    processor.add_texts(json.dumps(texts))
+    codec = CallbackCodec(processor, prefixes=['menu_'], id_length=1)
+    with pytest.raises(ValueError, match=' and '.join(sorted((first, second)))):
+        codec.validate()
@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from aiogram import Bot
+from aiogram.utils import exceptions as aiogram_exc
+
+from NekoGram.deletion import DeletionQueue
+from .conftest import TOKEN
+
+
+def test_close_finishes_batch_in_flight():
+    async def run():
+        bot = Bot(TOKEN, validate_token=False)
+        deleted, started = list(), asyncio.Event()
+
+        async def request(method, data=None, files=None, **kwargs):
+            started.set()
+            await asyncio.sleep(0.01)
+            deleted.append(data['message_ids'])
+            return True
+        bot.request = request
+
+        queue = DeletionQueue()
+        queue.schedule(bot, chat_id=1, message_id=10)
+        await started.wait()
+        await queue.close()
+        return deleted, len(queue)
+
+    deleted, left = asyncio.run(run())
+    assert deleted == ['[10]']
+    assert left == 0
+
+
+def test_flood_limited_chat_does_not_hold_up_others():
+    async def run():
+        bot = Bot(TOKEN, validate_token=False)
+        deleted, failures = list(), {1: [aiogram_exc.RetryAfter(1)], 2: [aiogram_exc.NetworkError('reset')]}
+
+        async def request(method, data=None, files=None, **kwargs):
+            if failures.get(data['chat_id']):
+                raise failures[data['chat_id']].pop()
+            deleted.append((data['chat_id'], time.monotonic()))
+            return True
+        bot.request = request
+
+        queue = DeletionQueue()
+        started = time.monotonic()
+        for chat_id in (1, 2, 3):
+            queue.schedule(bot, chat_id=chat_id, message_id=10)
+        await asyncio.sleep(0.1)
+        waiting = len(queue)
+        await queue.close()
+        return [(chat_id, at - started) for chat_id, at in deleted], waiting
+
+    deleted, waiting = asyncio.run(run())
+    assert deleted[0][0] == 3 and deleted[0][1] < 0.1  # Not delayed by the flood limit of chat 1
+    assert sorted(chat_id for chat_id, _ in deleted) == [1, 2, 3]  # Both failed chats are retried
+    assert waiting == 2
+
+
+def test_keyboard_is_removed_if_message_can_not_be_deleted():
+    async def run():
+        bot = Bot(TOKEN, validate_token=False)
+        calls = list()
+
+        async def request(method, data=None, files=None, **kwargs):
+            calls.append(method)
+            if method == 'deleteMessage':
+                raise aiogram_exc.MessageCantBeDeleted('message can\'t be deleted')
+            return True
+        bot.request = request
+
+        queue = DeletionQueue()
+        queue.schedule(bot, chat_id=1, message_id=10, strip_markup=True)
+        await queue.close()
+        return calls
+
+    assert asyncio.run(run()) == ['deleteMessage', 'editMessageReplyMarkup']
@@ -0,0 +1,17 @@
+import asyncio
+
+from aiogram import types
+
+
+def test_cached_keyboard_is_not_shared_between_menus(make_neko):
+    async def run():
+        neko = make_neko({'start': {'text': 'Meow', 'markup': [[{'text': 'a', 'call_data': 'menu_a'}]]}})
+        first = await neko.build_menu(name='start', obj=None, user_id=1)
+        first.markup.add(types.InlineKeyboardButton(text='b', callback_data='menu_b'))
+        second = await neko.build_menu(name='start', obj=None, user_id=1)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert 'menu_b' in str(first._reply_markup)  # The change is sent to the user
+    assert 'menu_b' not in str(second._reply_markup)  # Other renders keep the cached keyboard
+    assert first.markup is not second.markup
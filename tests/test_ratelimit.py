@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+from aiogram import Bot
+from aiogram.utils import exceptions as aiogram_exc
+
+from NekoGram.media import MediaReader
+from NekoGram.ratelimit import RateLimiter
+
+
+def test_media_upload_is_not_retried_after_flood_limit():
+    async def run():
+        bot = Bot('123:abc')
+        calls = []
+
+        async def send(method, data=None, files=None, **kwargs):
+            calls.append(files['photo'].closed)
+            files['photo'].close()  # MediaPayload closes the reader once it is written
+            raise aiogram_exc.RetryAfter(1)
+
+        bot.request = send
+        limiter = RateLimiter(global_rate=1000, chat_rate=1000, chat_burst=1000)
+        limiter.install(bot)
+        reader = MediaReader(memoryview(b'meow'), name='cat.png')
+        with pytest.raises(aiogram_exc.RetryAfter):
+            await bot.request('sendPhoto', {'chat_id': 1}, {'photo': reader})
+        return calls
+
+    assert asyncio.run(run()) == [False]  # Sent once with an open reader, the flood limit is reported to the caller
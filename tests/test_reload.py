@@ -0,0 +1,52 @@
+import asyncio
+import json
+import os
+import threading
+
+from NekoGram.text_processors import JSONProcessor
+
+
+def _write(path, texts):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(texts, file)
+
+
+def test_lazy_reload_parses_off_the_event_loop(tmp_path):
+    en, ru = tmp_path / 'en.json', tmp_path / 'ru.json'
+    _write(en, {'lang': 'en', 'start': {'text': 'Hi'}})
+    _write(ru, {'lang': 'ru', 'start': {'text': 'Privet'}})
+    processor = JSONProcessor(lazy=True)
+    processor.add_texts(str(tmp_path))
+    assert processor.get_language('en')['start']['text'] == 'Hi'
+
+    parsed_in = []
+    parse = processor._parse
+
+    def tracking_parse(texts):
+        parsed_in.append(threading.current_thread() is threading.main_thread())
+        return parse(texts)
+    processor._parse = tracking_parse
+
+    _write(en, {'lang': 'en', 'start': {'text': 'Hello'}})
+    os.utime(en, ns=(os.stat(en).st_mtime_ns + 10 ** 9,) * 2)
+    assert asyncio.run(processor.reload()) == 1
+    assert processor.get_language('en')['start']['text'] == 'Hello'
+    assert parsed_in == [False]
+
+
+def test_values_are_shared_between_languages_after_reload(tmp_path):
+    menu = {'text': 'Menu', 'markup': [[{'text': 'A', 'call_data': 'menu_a'}]]}
+    paths = {lang: tmp_path / f'{lang}.json' for lang in ('en', 'ru', 'uk')}
+    for lang, path in paths.items():
+        _write(path, {'lang': lang, 'start': {'text': lang}, 'menu': menu})
+    processor = JSONProcessor(lazy=True)
+    processor.add_texts(str(tmp_path))
+    processor.get_language('en')
+    processor.get_language('ru')
+
+    _write(paths['en'], {'lang': 'en', 'start': {'text': 'changed'}, 'menu': menu})
+    os.utime(paths['en'], ns=(os.stat(paths['en']).st_mtime_ns + 10 ** 9,) * 2)
+    assert asyncio.run(processor.reload()) == 1
+
+    markups = [processor.get_language(lang)['menu']['markup'] for lang in ('en', 'ru', 'uk')]
+    assert markups[0] is markups[1] and markups[1] is markups[2]
@@ -0,0 +1,47 @@
+import asyncio
+
+from aiogram import Bot, types
+
+from NekoGram.handlers.message import _start_handler
+
+
+def _start_message() -> types.Message:
+    return types.Message(**{
+        'message_id': 10,
+        'date': 0,
+        'chat': {'id': 1, 'type': 'private'},
+        'from': {'id': 1, 'is_bot': False, 'first_name': 'Neko'},
+        'text': '/start'
+    })
+
+
+def _run_start(neko, blocked):
+    async def run():
+        queries = []
+
+        async def check_user_blocked(user_id):
+            return blocked
+
+        async def apply(query, *args, **kwargs):
+            queries.append(query)
+            return 0
+
+        async def request(method, data=None, files=None, **kwargs):
+            return {'message_id': 11, 'date': 0, 'chat': {'id': 1, 'type': 'private'}}
+        neko.storage.check_user_blocked = check_user_blocked
+        neko.storage.apply = apply
+        neko.bot.request = request
+        Bot.set_current(neko.bot)
+
+        message = _start_message()
+        message.conf['neko'] = neko
+        await _start_handler(message)
+        return queries
+
+    return asyncio.run(run())
+
+
+def test_start_only_unblocks_blocked_users(make_neko):
+    texts = {'start': {'text': 'Meow'}}
+    assert not any('nekogram_blocked_users' in q for q in _run_start(make_neko(texts), blocked=False))
+    assert any(q.startswith('DELETE FROM nekogram_blocked_users') for q in _run_start(make_neko(texts), blocked=True))
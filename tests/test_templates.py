@@ -0,0 +1,11 @@
+def test_templates_are_kept_per_processor(make_neko):
+    first = make_neko({'start': {'text': 'Hello, {name}'}})
+    second = make_neko({'start': {'text': 'Hi, {name}'}})
+    first.text_processor.get_language('en')
+    second.text_processor.get_language('en')
+
+    assert 'Hello, {name}' in first.text_processor._templates['en']
+    assert 'Hello, {name}' not in second.text_processor._templates['en']
+
+    first.text_processor._unload_language('en')
+    assert 'en' not in first.text_processor._templates
@@ -0,0 +1,111 @@
+import asyncio
+
+from aiogram import Bot, types
+
+from NekoGram.ratelimit import RateLimiter
+from NekoGram.webhook_reply import WebhookReply, reply_in_webhook
+
+from .conftest import TOKEN
+
+
+def _message(message_id: int) -> types.Message:
+    return types.Message(**{
+        'message_id': message_id,
+        'date': 0,
+        'chat': {'id': 1, 'type': 'private'},
+        'from': {'id': 1, 'is_bot': False, 'first_name': 'Neko'},
+        'text': 'meow'
+    })
+
+
+def test_limiter_is_found_through_webhook_reply():
+    async def run():
+        bot = Bot(TOKEN)
+        limiter = RateLimiter()
+        limiter.install(bot)
+        WebhookReply.install(bot)
+        found = RateLimiter.installed(bot)
+        RateLimiter.uninstall(bot)
+        return found, RateLimiter.installed(bot), getattr(bot.request, 'webhook_reply', False), limiter
+
+    found, after_uninstall, reply_installed, limiter = asyncio.run(run())
+    assert found is limiter
+    assert after_uninstall is None
+    assert reply_installed
+
+
+def test_send_message_is_not_held_with_deleted_messages(make_neko):
+    async def run():
+        neko = make_neko({'start': {'text': 'Meow'}})
+        assert neko.delete_messages  # Default config
+
+        sent = []
+
+        async def request(method, data=None, files=None, **kwargs):
+            sent.append(method)
+            if method == 'sendMessage':
+                return {'message_id': 11, 'date': 0, 'chat': {'id': 1, 'type': 'private'}}
+            return True
+        neko.bot.request = request
+        WebhookReply.install(neko.bot)
+        Bot.set_current(neko.bot)
+
+        reply = WebhookReply(token=TOKEN)
+        with reply.bind():
+            message = _message(10)
+            message.conf['neko'] = neko
+            menu = await neko.build_menu(name='start', obj=message)
+            with reply_in_webhook():
+                await menu.send_message()
+        held = [reply.close()]
+
+        reply = WebhookReply(token=TOKEN)
+        with reply.bind(), reply_in_webhook():
+            await neko.bot.answer_callback_query('1')
+        held.append(reply.close())
+        return held, sent, await neko.storage.get_last_message_id(user_id=1)
+
+    held, sent, last_message_id = asyncio.run(run())
+    assert held[0] is None and sent == ['sendMessage']
+    assert last_message_id == 11  # The ID of the new menu is known
+    assert held[1][0] == 'answerCallbackQuery'  # Results of other calls are not needed
+
+
+def test_held_call_is_sent_when_processing_fails(make_neko):
+    from types import SimpleNamespace
+    from NekoGram.webhook import KittyWebhook
+
+    neko = make_neko({'start': {'text': 'Meow'}})
+    sent = []
+
+    async def request(method, data=None, files=None, **kwargs):
+        sent.append(method)
+        return True
+    neko.bot.request = request
+    WebhookReply.install(neko.bot)
+
+    class Handler(KittyWebhook):
+        def __init__(self):
+            self._request = SimpleNamespace(app={'APP_EXECUTOR': SimpleNamespace(neko=neko)},
+                                            match_info={'token': TOKEN})
+
+        def validate_ip(self):
+            pass
+
+        def get_dispatcher(self):
+            return neko.dp
+
+        async def parse_update(self, bot):
+            return types.Update(update_id=1)
+
+        async def process_update(self, update):
+            with reply_in_webhook():
+                await neko.bot.answer_callback_query('1')
+            raise RuntimeError('handler failed')
+
+    async def run():
+        try:
+            await Handler().post()
+        except RuntimeError:
+            return sent
+    assert asyncio.run(run()) == ['answerCallbackQuery']